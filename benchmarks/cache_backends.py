@@ -0,0 +1,113 @@
+"""
+Сравнение пропускной способности бэкендов кеша при работе из нескольких
+процессов: LocMemCache, FileBasedCache и yatube.cache.SQLiteCache.
+
+    python benchmarks/cache_backends.py --processes 8 --operations 5000
+
+Кроме операций в секунду выводится доля инкрементов, видимых всем
+процессам: для LocMemCache она меньше единицы, так как у каждого
+процесса свой кеш.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.utils.module_loading import import_string  # noqa: E402
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'filebased': 'django.core.cache.backends.filebased.FileBasedCache',
+    'sqlite': 'yatube.cache.SQLiteCache',
+}
+
+
+def make_cache(backend, location):
+    return import_string(BACKENDS[backend])(location, {
+        'TIMEOUT': 300, 'OPTIONS': {'MAX_ENTRIES': 100000},
+    })
+
+
+def worker(backend, location, operations, write_ratio, keys, seed, barrier):
+    cache = make_cache(backend, location)
+    rnd = random.Random(seed)
+    payload = 'x' * 2048
+    barrier.wait()
+    for _ in range(operations):
+        key = f'key{rnd.randrange(keys)}'
+        if rnd.random() < write_ratio:
+            cache.set(key, payload)
+        else:
+            cache.get(key)
+    cache.incr('shared_counter')
+
+
+def run(backend, processes, operations, write_ratio, keys):
+    location = tempfile.mkdtemp(prefix=f'cache-{backend}-')
+    if backend == 'sqlite':
+        location = os.path.join(location, 'cache.sqlite3')
+    cache = make_cache(backend, location)
+    cache.set('shared_counter', 0)
+    barrier = multiprocessing.Barrier(processes + 1)
+    workers = [
+        multiprocessing.Process(target=worker, args=(
+            backend, location, operations, write_ratio, keys, seed, barrier
+        ))
+        for seed in range(processes)
+    ]
+    for process in workers:
+        process.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for process in workers:
+        process.join()
+    elapsed = time.perf_counter() - started
+    return {
+        'backend': backend,
+        'processes': processes,
+        'operations': processes * operations,
+        'seconds': round(elapsed, 3),
+        'ops_per_second': round(processes * operations / elapsed),
+        'shared_increments': cache.get('shared_counter', 0) / processes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--operations', type=int, default=2000)
+    parser.add_argument('--write-ratio', type=float, default=0.1)
+    parser.add_argument('--keys', type=int, default=1000)
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS))
+    parser.add_argument('--json', help='Файл для сохранения результатов')
+    args = parser.parse_args()
+
+    settings.configure()
+    django.setup()
+    multiprocessing.set_start_method('fork')
+
+    results = [
+        run(backend, args.processes, args.operations, args.write_ratio,
+            args.keys)
+        for backend in args.backends
+    ]
+    for result in results:
+        print(
+            f"{result['backend']:>10}: {result['ops_per_second']:>8} оп/с, "
+            f"видимость инкрементов {result['shared_increments']:.0%}"
+        )
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
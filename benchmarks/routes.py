@@ -0,0 +1,166 @@
+"""
+Замер задержек всех маршрутов posts/urls.py и users/urls.py.
+
+Для каждого маршрута выполняется заданное число запросов от анонима и
+от автора записи; в отчет попадают p50/p95/p99 времени ответа, число
+SQL-запросов и размер ответа. Результат сохраняется в JSON, чтобы
+сравнивать прогоны между коммитами. Маршруты, принимающие только POST,
+не замеряются. Кеш и файл метрик на время прогона переносятся во
+временный каталог, чтобы --cold не очищал кеш работающего сайта:
+
+    python manage.py generate_dataset --posts 100000 --comments 300000
+    python benchmarks/routes.py --requests 200 --output bench.json
+"""
+import argparse
+import atexit
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+if 'YATUBE_STATE_DIR' not in os.environ:
+    os.environ['YATUBE_STATE_DIR'] = tempfile.mkdtemp(prefix='yatube-bench-')
+    atexit.register(
+        shutil.rmtree, os.environ['YATUBE_STATE_DIR'], ignore_errors=True
+    )
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.cache import cache  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+from posts import urls as posts_urls  # noqa: E402
+from posts.models import Group, Post  # noqa: E402
+from users import urls as users_urls  # noqa: E402
+
+# Представления под require_POST: GET измерил бы только ответ 405.
+POST_ONLY = {'profile_follow', 'profile_unfollow'}
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = max(math.ceil(percent / 100 * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+def route_urls():
+    post = Post.objects.order_by('-comment_count', '-pk').first()
+    group = Group.objects.order_by('-pk').first()
+    if post is None or group is None:
+        sys.exit('Нет данных: сначала выполните generate_dataset.')
+    kwargs_values = {
+        'slug': group.slug,
+        'username': post.author.username,
+        'post_id': post.pk,
+    }
+    query = {'search': {'q': post.text.split()[0]}}
+    urls = {}
+    for pattern in (*posts_urls.urlpatterns, *users_urls.urlpatterns):
+        if pattern.name in POST_ONLY:
+            continue
+        names = pattern.pattern.converters
+        kwargs = {name: kwargs_values[name] for name in names}
+        url = reverse(pattern.name, kwargs=kwargs)
+        if pattern.name in query:
+            url = f'{url}?{urlencode(query[pattern.name])}'
+        urls[pattern.name] = url
+    return urls, post.author
+
+
+def get(client, url):
+    try:
+        response = client.get(url)
+    except Exception as error:
+        # Тестовый клиент пробрасывает исключения представлений;
+        # для замера это просто ответ с ошибкой.
+        return 500, len(str(error))
+    return response.status_code, len(response.content)
+
+
+def measure(client, url, requests, cold):
+    timings, queries, sizes, statuses = [], [], [], set()
+    for _ in range(requests):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            status, size = get(client, url)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured))
+        sizes.append(size)
+        statuses.add(status)
+    return {
+        'url': url,
+        'status': sorted(statuses),
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'p99_ms': round(percentile(timings, 99), 2),
+        'queries': round(sum(queries) / len(queries), 2),
+        'bytes': round(sum(sizes) / len(sizes)),
+    }
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument(
+        '--cold', action='store_true',
+        help='Очищать кеш перед каждым запросом.'
+    )
+    parser.add_argument('--output', help='Файл для сохранения JSON')
+    args = parser.parse_args()
+
+    urls, author = route_urls()
+    author_client = Client()
+    author_client.force_login(author)
+    clients = {'anonymous': Client(), 'author': author_client}
+
+    results = []
+    for name, url in urls.items():
+        for role, client in clients.items():
+            for _ in range(args.warmup):
+                get(client, url)
+            result = measure(client, url, args.requests, args.cold)
+            result.update(route=name, client=role)
+            results.append(result)
+            print(
+                f"{name:>12} {role:>9}: p50 {result['p50_ms']:>8} мс, "
+                f"p95 {result['p95_ms']:>8} мс, p99 {result['p99_ms']:>8} мс, "
+                f"{result['queries']:>6} SQL, {result['bytes']:>8} байт"
+            )
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({
+                'commit': current_commit(),
+                'requests': args.requests,
+                'cold': args.cold,
+                'posts': Post.objects.count(),
+                'results': results,
+            }, output, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,27 +1,116 @@
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin
+from django.db.models.expressions import RawSQL
 
-from .models import Comment, Group, Post
+from posts.jobs import enqueue
 
+from .deletion import delete_groups, delete_posts, delete_users
+from .models import Comment, Group, Post, User
+from .paginators import EstimatedCountPaginator
+from .search import match_expression, matching_ids_sql
 
-class PostAdmin(admin.ModelAdmin):
+
+def prefix_range(field, prefix):
+    """
+    Поиск по началу строки диапазоном вместо LIKE: так SQLite может
+    использовать обычный индекс по полю. Регистр учитывается.
+    """
+    return {f'{field}__gte': prefix, f'{field}__lt': prefix + '\U0010ffff'}
+
+
+def background_delete_action(task, description):
+    """
+    Действие админки: ставит пакетное удаление выбранных объектов в
+    очередь задач вместо удаления в запросе.
+    """
+    def action(modeladmin, request, queryset):
+        ids = list(queryset.values_list('pk', flat=True))
+        enqueue(task, ids)
+        modeladmin.message_user(
+            request, f'Удаление поставлено в очередь: {len(ids)}'
+        )
+    action.short_description = description
+    action.__name__ = f'background_{task.__name__}'
+    return action
+
+
+class BackgroundDeleteMixin:
+    """
+    Убирает встроенное действие delete_selected: оно собирает каскад
+    удаления в памяти. Вместо него — действие background_delete_action.
+    """
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # Без второго COUNT(*) по всей таблице для «показать все».
+    show_full_result_count = False
+    empty_value_display = ('-пусто-')
+
+
+class PostAdmin(BackgroundDeleteMixin, LargeTableAdmin):
     list_display = ('id', 'text', 'pub_date', 'author', 'group')
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date', 'group')
-    empty_value_display = ('-пусто-')
+    date_hierarchy = 'pub_date'
+    raw_id_fields = ('author', 'group')
+    actions = [background_delete_action(
+        delete_posts, 'Удалить выбранные записи в фоне'
+    )]
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        if not match_expression(search_term):
+            # Одни знаки препинания: пустой MATCH — синтаксическая ошибка.
+            return queryset.none(), False
+        return queryset.filter(
+            pk__in=RawSQL(*matching_ids_sql(search_term))
+        ), False
 
-class GroupAdmin(admin.ModelAdmin):
+
+class GroupAdmin(BackgroundDeleteMixin, admin.ModelAdmin):
     list_display = ('id', 'title', 'description')
-    search_fields = ('text',)
+    search_fields = ('title', 'slug')
+    actions = [background_delete_action(
+        delete_groups, 'Удалить выбранные сообщества в фоне'
+    )]
     empty_value_display = ('-пусто-')
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = ('id', 'post', 'author', 'text', 'created')
-    search_fields = ('text', 'author')
-    empty_value_display = ('-пусто-')
+    list_select_related = ('post__author', 'author')
+    # Поле поиска ищет только по началу имени автора, и то диапазоном
+    # по индексу в get_search_results: поиск по тексту комментариев
+    # потребовал бы полного просмотра таблицы.
+    search_fields = ('^author__username',)
+    date_hierarchy = 'created'
+    raw_id_fields = ('post', 'author')
+
+    def get_search_results(self, request, queryset, search_term):
+        username = search_term.strip()
+        if not username:
+            return queryset, False
+        return queryset.filter(
+            **prefix_range('author__username', username)
+        ), False
+
+
+class BulkDeleteUserAdmin(BackgroundDeleteMixin, UserAdmin):
+    actions = [background_delete_action(
+        delete_users, 'Удалить выбранных пользователей с их записями в фоне'
+    )]
 
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
+admin.site.unregister(User)
+admin.site.register(User, BulkDeleteUserAdmin)
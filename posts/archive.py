@@ -0,0 +1,109 @@
+"""
+Перенос старых записей и их комментариев в архивные таблицы.
+
+Почти все чтения приходятся на последние недели, поэтому горячие
+таблицы posts_post и posts_comment вместе с их индексами держатся
+маленькими, а все, что старше POST_ARCHIVE_AFTER_DAYS, переезжает в
+posts_archivedpost и posts_archivedcomment под прежними id. Записи
+переносятся пачками, как при пакетном удалении: сначала комментарии
+своими пачками, затем сама пачка записей в одной короткой транзакции.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .cache import SITE_SCOPE_KEY, bump_version
+from .counters import change_author_counter, change_group_counter
+from .deletion import BulkDeleter, batches, delete_rows
+from .models import (ArchivedComment, ArchivedPost, Comment, Post,
+                     TimelineEntry)
+
+logger = logging.getLogger(__name__)
+
+
+def log_progress(stage, count):
+    logger.info('stage=%s archived=%s', stage, count)
+
+
+def archive_cutoff(days=None):
+    if days is None:
+        days = settings.POST_ARCHIVE_AFTER_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+def copy_rows(queryset, target):
+    """
+    Копирует строки в архивную модель с теми же именами полей.
+
+    Копирование и удаление исходных строк идут в одной транзакции, так
+    что строка с тем же id в архиве означает конфликт, а не повтор
+    прерванной пачки: IntegrityError откатывает пачку целиком, и
+    исходные строки не теряются.
+    """
+    fields = [field.attname for field in target._meta.concrete_fields]
+    target.objects.bulk_create(
+        [target(**row) for row in queryset.values(*fields)]
+    )
+
+
+class PostArchiver(BulkDeleter):
+    def __init__(self, batch_size=None, progress=log_progress):
+        super().__init__(batch_size, progress)
+
+    def move_comments(self, ids):
+        comments = Comment.objects.filter(pk__in=ids)
+        copy_rows(comments, ArchivedComment)
+        delete_rows(Comment, ids)
+
+    def archive(self, cutoff):
+        done = 0
+        posts = Post.objects.filter(pub_date__lt=cutoff)
+        for ids in batches(posts, self.batch_size):
+            self.run(
+                'post comments', Comment.objects.filter(post_id__in=ids),
+                self.move_comments,
+            )
+            # Ленты подписок ссылаются только на горячие записи.
+            self.run(
+                'timeline entries',
+                TimelineEntry.objects.filter(post_id__in=ids),
+                lambda entry_ids: delete_rows(TimelineEntry, entry_ids),
+            )
+            with transaction.atomic():
+                self.archive_post_batch(ids)
+            done += len(ids)
+            self.progress('posts', done)
+        if done:
+            bump_version(SITE_SCOPE_KEY)
+        return done
+
+    def archive_post_batch(self, ids):
+        # Комментарии и строки лент, появившиеся после переноса выше.
+        late = list(Comment.objects.filter(post_id__in=ids).values_list(
+            'pk', flat=True
+        ))
+        if late:
+            self.move_comments(late)
+        late = list(TimelineEntry.objects.filter(
+            post_id__in=ids
+        ).values_list('pk', flat=True))
+        if late:
+            delete_rows(TimelineEntry, late)
+        posts = Post.objects.filter(pk__in=ids)
+        authors = list(posts.order_by().values('author_id').annotate(
+            total=Count('pk')
+        ).values_list('author_id', 'total'))
+        groups = list(posts.exclude(group=None).order_by().values(
+            'group_id'
+        ).annotate(total=Count('pk')).values_list('group_id', 'total'))
+        copy_rows(posts, ArchivedPost)
+        delete_rows(Post, ids)
+        # posts_count остается прежним: это все записи автора и сообщества.
+        for author_id, total in authors:
+            change_author_counter(author_id, 'archived_posts_count', total)
+        for group_id, total in groups:
+            change_group_counter(group_id, 'archived_posts_count', total)
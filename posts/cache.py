@@ -0,0 +1,152 @@
+import time
+from datetime import datetime
+
+from django.core.cache import cache
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from .metrics import counter_value, inc
+
+SITE_SCOPE_KEY = 'page:version:site'
+
+CACHE_RESULTS = {'hits': 'hit', 'misses': 'miss'}
+
+
+def new_version():
+    return int(time.time() * 1000)
+
+
+def get_versions(*names):
+    versions = cache.get_many(names)
+    missing = {name: new_version() for name in names if name not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[name] for name in names]
+
+
+def bump_version(name):
+    # Версия растет атомарно и при этом остается отметкой времени в
+    # миллисекундах: по ней строится Last-Modified.
+    current = cache.get(name)
+    if current is not None:
+        try:
+            cache.incr(name, max(new_version() - current, 1))
+            return
+        except ValueError:
+            pass
+    cache.set(name, new_version(), None)
+
+
+def count_event(name):
+    layer, result = name.split(':')
+    # Только в хранилище метрик: там приращения запроса пишутся одной
+    # транзакцией, а не отдельной записью в общий кеш на каждое событие.
+    inc(
+        'yatube_cache_requests_total', layer=layer,
+        result=CACHE_RESULTS[result],
+    )
+
+
+def get_hit_ratio(prefix):
+    hits, misses = (
+        int(counter_value(
+            'yatube_cache_requests_total', layer=prefix, result=result
+        ))
+        for result in ('hit', 'miss')
+    )
+    total = hits + misses
+    return hits, misses, hits / total if total else 0
+
+
+def post_version_key(post_id):
+    return f'post_card:version:post:{post_id}'
+
+
+def group_version_key(group_id):
+    return f'post_card:version:group:{group_id}'
+
+
+def post_card_key(post):
+    names = [post_version_key(post.pk)]
+    if post.group_id:
+        names.append(group_version_key(post.group_id))
+    versions = '.'.join(str(version) for version in get_versions(*names))
+    return f'post_card:{post.pk}:{versions}'
+
+
+def page_scope_key(url_name, **kwargs):
+    if url_name == 'group_posts':
+        return f'page:version:group:{kwargs["slug"]}'
+    if url_name == 'profile':
+        return f'page:version:profile:{kwargs["username"]}'
+    return 'page:version:index'
+
+
+def page_key(url_name, kwargs, query):
+    scope = page_scope_key(url_name, **kwargs)
+    version, site_version = get_versions(scope, SITE_SCOPE_KEY)
+    return f'page:{scope}:{version}.{site_version}:{query}'
+
+
+def feed_count_key(url_name, **kwargs):
+    scope = page_scope_key(url_name, **kwargs)
+    version, site_version = get_versions(scope, SITE_SCOPE_KEY)
+    return f'count:{scope}:{version}.{site_version}'
+
+
+def page_version_names(url_name, kwargs):
+    if url_name in ('post', 'post_comments'):
+        names = [
+            post_version_key(kwargs['post_id']),
+            page_scope_key('profile', username=kwargs['username']),
+        ]
+    else:
+        names = [page_scope_key(url_name, **kwargs)]
+    return [*names, SITE_SCOPE_KEY]
+
+
+def changed_recently(url_name, kwargs, seconds):
+    """Менялась ли страница за последние seconds секунд."""
+    versions = get_versions(*page_version_names(url_name, kwargs))
+    return new_version() - max(versions) < seconds * 1000
+
+
+def page_validators(request, url_name, kwargs):
+    validators = getattr(request, '_page_validators', None)
+    if validators is None:
+        versions = get_versions(*page_version_names(url_name, kwargs))
+        # Страницы различаются для читателей: в ETag входит пользователь.
+        etag = '.'.join(str(part) for part in (*versions, request.user.pk))
+        last_modified = datetime.fromtimestamp(
+            max(versions) / 1000, timezone.utc
+        )
+        validators = request._page_validators = (etag, last_modified)
+    return validators
+
+
+def conditional_page(url_name):
+    """
+    Отвечает 304 Not Modified до рендеринга, если версии ленты или
+    записи не изменились. Проверка стоит одного запроса get_many к кешу.
+    """
+    return condition(
+        etag_func=lambda request, **kwargs: page_validators(
+            request, url_name, kwargs
+        )[0],
+        last_modified_func=lambda request, **kwargs: page_validators(
+            request, url_name, kwargs
+        )[1],
+    )
+
+
+def purge_post_pages(post, *groups):
+    scopes = [
+        page_scope_key('index'),
+        page_scope_key('profile', username=post.author.username),
+    ]
+    for group in {post.group, *groups}:
+        if group is not None:
+            scopes.append(page_scope_key('group_posts', slug=group.slug))
+    for scope in scopes:
+        bump_version(scope)
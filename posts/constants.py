@@ -2,16 +2,54 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 
 form_post_labels = {
     'group': 'Выберите сообщество',
-    'text': 'Заполните текст'
+    'text': 'Заполните текст',
+    'image': 'Загрузите изображение'
     }
 
 form_post_help_texts = {
     'group': 'Не обязательное поле',
-    'text': 'Обязательное поле'
+    'text': 'Обязательное поле',
+    'image': 'Не обязательное поле'
     }
 
 posts_per_page = 10
 
+comments_per_page = 20
+
+page_window = 2
+
+max_page_number = 50
+
+estimated_count_threshold = 100000
+
+post_card_cache_seconds = 24 * 60 * 60
+
+page_cache_seconds = 20
+
+thumbnail_width = 960
+
+image_variant_widths = (320, 640, 960)
+
+image_max_size = (1920, 1920)
+
+image_quality = 85
+
+placeholder_size = (24, 24)
+
+celebrity_follower_threshold = 10000
+
+fan_out_batch_size = 1000
+
+timeline_backfill_posts = 100
+
+deletion_batch_size = 500
+
+job_max_attempts = 3
+
+job_retry_delay_seconds = 10
+
+job_timeout_seconds = 10 * 60
+
 small_gif = (
     b'\x47\x49\x46\x38\x39\x61\x02\x00'
     b'\x01\x00\x80\x00\x00\x00\x00\x00'
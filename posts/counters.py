@@ -0,0 +1,151 @@
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts import constants
+
+from .cache import count_event
+from .models import (ArchivedPost, AuthorCounter, Comment, Follow, Group,
+                     GroupCounter, Post, User)
+
+
+def change_counter(model, owner, owner_id, field, delta):
+    counters = model.objects.filter(**{owner: owner_id})
+    if delta < 0:
+        # Строку счетчика при уменьшении не создаем: автор или
+        # сообщество могут удаляться каскадно.
+        counters.filter(**{f'{field}__gte': -delta}).update(
+            **{field: F(field) + delta}
+        )
+        return
+    if not counters.update(**{field: F(field) + delta}):
+        model.objects.get_or_create(**{owner: owner_id})
+        counters.update(**{field: F(field) + delta})
+
+
+def change_author_counter(user_id, field, delta):
+    change_counter(AuthorCounter, 'user_id', user_id, field, delta)
+
+
+def change_group_counter(group_id, field, delta):
+    change_counter(GroupCounter, 'group_id', group_id, field, delta)
+
+
+def change_comment_count(post_id, delta):
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comment_count__gte=-delta)
+    posts.update(comment_count=F('comment_count') + delta)
+
+
+def count_subquery(queryset, field, outer='pk'):
+    counts = queryset.filter(**{field: OuterRef(outer)}).order_by().values(
+        field
+    ).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def reconcile_comment_counts(first_pk, last_pk):
+    actual = count_subquery(Comment.objects.all(), 'post')
+    return Post.objects.filter(pk__range=(first_pk, last_pk)).annotate(
+        actual=actual
+    ).exclude(comment_count=F('actual')).update(comment_count=actual)
+
+
+def reconcile_author_counters(first_pk, last_pk):
+    users = User.objects.filter(pk__range=(first_pk, last_pk))
+    AuthorCounter.objects.bulk_create(
+        [AuthorCounter(user_id=pk)
+         for pk in users.filter(counter=None).values_list('pk', flat=True)],
+        ignore_conflicts=True,
+    )
+    actual = {
+        # posts_count — все записи автора, вместе с архивными.
+        'posts_count': count_subquery(
+            Post.objects.all(), 'author', outer='user'
+        ) + count_subquery(
+            ArchivedPost.objects.all(), 'author', outer='user'
+        ),
+        'archived_posts_count': count_subquery(
+            ArchivedPost.objects.all(), 'author', outer='user'
+        ),
+        'followers_count': count_subquery(
+            Follow.objects.all(), 'author', outer='user'
+        ),
+        'following_count': count_subquery(
+            Follow.objects.all(), 'user', outer='user'
+        ),
+    }
+    counters = AuthorCounter.objects.filter(
+        user__id__range=(first_pk, last_pk)
+    ).annotate(**{f'actual_{field}': value for field, value in actual.items()})
+    # Исправляются строки, где расходится хотя бы один из счетчиков.
+    return counters.exclude(
+        **{field: F(f'actual_{field}') for field in actual}
+    ).update(**actual)
+
+
+def reconcile_group_counters(first_pk, last_pk):
+    groups = Group.objects.filter(pk__range=(first_pk, last_pk))
+    GroupCounter.objects.bulk_create(
+        [GroupCounter(group_id=pk)
+         for pk in groups.filter(counter=None).values_list('pk', flat=True)],
+        ignore_conflicts=True,
+    )
+    actual = {
+        # posts_count — все записи сообщества, вместе с архивными.
+        'posts_count': count_subquery(
+            Post.objects.all(), 'group', outer='group'
+        ) + count_subquery(
+            ArchivedPost.objects.all(), 'group', outer='group'
+        ),
+        'archived_posts_count': count_subquery(
+            ArchivedPost.objects.all(), 'group', outer='group'
+        ),
+    }
+    counters = GroupCounter.objects.filter(
+        group__id__range=(first_pk, last_pk)
+    ).annotate(**{f'actual_{field}': value for field, value in actual.items()})
+    return counters.exclude(
+        **{field: F(f'actual_{field}') for field in actual}
+    ).update(**actual)
+
+
+def table_row_estimate(model):
+    """Число строк таблицы по статистике ANALYZE (sqlite_stat1)."""
+    if connection.vendor != 'sqlite':
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                [model._meta.db_table],
+            )
+            row = cursor.fetchone()
+    except DatabaseError:
+        # Таблицы sqlite_stat1 нет, пока не выполнен ANALYZE.
+        return None
+    return int(row[0].split()[0]) if row else None
+
+
+def estimated_count(queryset, cache_key=None):
+    """
+    Число записей для пагинатора.
+
+    Значение кешируется под ключом, в который вызывающий код включает
+    версию ленты, поэтому после записи оно пересчитывается. Для ленты
+    без фильтров по большой таблице вместо COUNT(*) берется оценка из
+    статистики SQLite.
+    """
+    count = cache.get(cache_key) if cache_key else None
+    if cache_key:
+        count_event('count:misses' if count is None else 'count:hits')
+    if count is None:
+        if not queryset.query.where:
+            count = table_row_estimate(queryset.model)
+        if count is None or count < constants.estimated_count_threshold:
+            count = queryset.count()
+        if cache_key:
+            cache.set(cache_key, count, constants.post_card_cache_seconds)
+    return count
@@ -0,0 +1,271 @@
+"""
+Пакетное удаление пользователей, сообществ и записей.
+
+Каскад Django загружает в память все связанные строки и отправляет
+сигналы по одной, удерживая блокировку записи SQLite все это время.
+Здесь связанные строки удаляются пачками в порядке зависимостей, каждая
+пачка — в своей короткой транзакции, а побочные эффекты сигналов
+(счетчики, версии кеша, файлы) выполняются сразу для всей пачки.
+"""
+import logging
+
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Count, F, Q
+
+from posts import constants
+from posts.jobs import enqueue
+
+from .cache import (SITE_SCOPE_KEY, bump_version, page_scope_key,
+                    post_version_key)
+from .counters import (change_author_counter, change_comment_count,
+                       change_group_counter)
+from .models import (ArchivedComment, ArchivedPost, Comment, Follow, Group,
+                     Post, TimelineEntry, User)
+from .thumbnails import image_variants, thumbnail_name
+
+logger = logging.getLogger(__name__)
+
+
+def log_progress(stage, count):
+    logger.info('stage=%s deleted=%s', stage, count)
+
+
+def batches(queryset, batch_size):
+    """
+    Первичные ключи пачками. Каждая пачка выбирается заново с начала:
+    предыдущая к этому моменту уже удалена или изменена.
+    """
+    while True:
+        ids = list(
+            queryset.order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return
+        yield ids
+
+
+def delete_rows(model, ids):
+    """DELETE без коллектора Django и без сигналов."""
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.pk.column)
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {column} IN ({placeholders})', ids
+        )
+
+
+class BulkDeleter:
+    def __init__(self, batch_size=None, progress=log_progress):
+        self.batch_size = batch_size or constants.deletion_batch_size
+        self.progress = progress
+
+    def run(self, stage, queryset, delete_batch):
+        done = 0
+        for ids in batches(queryset, self.batch_size):
+            with transaction.atomic():
+                delete_batch(ids)
+            done += len(ids)
+            self.progress(stage, done)
+        return done
+
+    def delete_comments(self, queryset):
+        return self.run('comments', queryset, self.delete_comment_batch)
+
+    def delete_comment_batch(self, ids):
+        counts = list(Comment.objects.filter(pk__in=ids).order_by().values(
+            'post_id'
+        ).annotate(total=Count('pk')).values_list('post_id', 'total'))
+        delete_rows(Comment, ids)
+        for post_id, total in counts:
+            change_comment_count(post_id, -total)
+            bump_version(post_version_key(post_id))
+
+    def delete_posts(self, queryset):
+        done = 0
+        for ids in batches(queryset, self.batch_size):
+            # Комментарии и ленты могут быть намного больше самих записей,
+            # поэтому они удаляются своими пачками.
+            self.run(
+                'post comments', Comment.objects.filter(post_id__in=ids),
+                lambda comment_ids: delete_rows(Comment, comment_ids),
+            )
+            self.run(
+                'timeline entries',
+                TimelineEntry.objects.filter(post_id__in=ids),
+                lambda entry_ids: delete_rows(TimelineEntry, entry_ids),
+            )
+            with transaction.atomic():
+                self.delete_post_batch(ids)
+            done += len(ids)
+            self.progress('posts', done)
+        return done
+
+    def delete_post_batch(self, ids):
+        # Строки, появившиеся после пачечного удаления выше.
+        for model in (Comment, TimelineEntry):
+            late = list(model.objects.filter(post_id__in=ids).values_list(
+                'pk', flat=True
+            ))
+            if late:
+                delete_rows(model, late)
+        posts = Post.objects.filter(pk__in=ids)
+        authors = list(posts.order_by().values('author_id').annotate(
+            total=Count('pk')
+        ).values_list('author_id', 'total'))
+        groups = list(posts.exclude(group=None).order_by().values(
+            'group_id'
+        ).annotate(total=Count('pk')).values_list('group_id', 'total'))
+        images = list(posts.exclude(image='').exclude(image=None).order_by(
+        ).values_list('image', flat=True).distinct())
+        delete_rows(Post, ids)
+        for author_id, total in authors:
+            change_author_counter(author_id, 'posts_count', -total)
+        for group_id, total in groups:
+            change_group_counter(group_id, 'posts_count', -total)
+        for post_id in ids:
+            bump_version(post_version_key(post_id))
+        if images:
+            # Задача попадет в очередь только вместе с фиксацией пачки.
+            enqueue(delete_media, images)
+
+    def delete_archived_comments(self, queryset):
+        return self.run(
+            'archived comments', queryset, self.delete_archived_comment_batch
+        )
+
+    def delete_archived_comment_batch(self, ids):
+        counts = list(ArchivedComment.objects.filter(
+            pk__in=ids
+        ).order_by().values('post_id').annotate(
+            total=Count('pk')
+        ).values_list('post_id', 'total'))
+        delete_rows(ArchivedComment, ids)
+        for post_id, total in counts:
+            ArchivedPost.objects.filter(
+                pk=post_id, comment_count__gte=total
+            ).update(comment_count=F('comment_count') - total)
+            bump_version(post_version_key(post_id))
+
+    def delete_archived_posts(self, queryset):
+        done = 0
+        for ids in batches(queryset, self.batch_size):
+            self.run(
+                'archived post comments',
+                ArchivedComment.objects.filter(post_id__in=ids),
+                lambda comment_ids: delete_rows(ArchivedComment, comment_ids),
+            )
+            with transaction.atomic():
+                self.delete_archived_post_batch(ids)
+            done += len(ids)
+            self.progress('archived posts', done)
+        return done
+
+    def delete_archived_post_batch(self, ids):
+        posts = ArchivedPost.objects.filter(pk__in=ids)
+        authors = list(posts.order_by().values('author_id').annotate(
+            total=Count('pk')
+        ).values_list('author_id', 'total'))
+        groups = list(posts.exclude(group=None).order_by().values(
+            'group_id'
+        ).annotate(total=Count('pk')).values_list('group_id', 'total'))
+        images = list(posts.exclude(image='').exclude(image=None).order_by(
+        ).values_list('image', flat=True).distinct())
+        delete_rows(ArchivedPost, ids)
+        for author_id, total in authors:
+            change_author_counter(author_id, 'posts_count', -total)
+            change_author_counter(author_id, 'archived_posts_count', -total)
+        for group_id, total in groups:
+            change_group_counter(group_id, 'posts_count', -total)
+            change_group_counter(group_id, 'archived_posts_count', -total)
+        for post_id in ids:
+            bump_version(post_version_key(post_id))
+        if images:
+            enqueue(delete_media, images)
+
+    def delete_follows(self, queryset):
+        return self.run('follows', queryset, self.delete_follow_batch)
+
+    def delete_follow_batch(self, ids):
+        pairs = list(Follow.objects.filter(pk__in=ids).values_list(
+            'user_id', 'author_id'
+        ))
+        delete_rows(Follow, ids)
+        for user_id, author_id in pairs:
+            change_author_counter(author_id, 'followers_count', -1)
+            change_author_counter(user_id, 'following_count', -1)
+
+    def delete_user(self, user):
+        self.delete_posts(Post.objects.filter(author=user))
+        self.delete_archived_posts(ArchivedPost.objects.filter(author=user))
+        self.delete_comments(Comment.objects.filter(author=user))
+        self.delete_archived_comments(
+            ArchivedComment.objects.filter(author=user)
+        )
+        self.delete_follows(
+            Follow.objects.filter(Q(user=user) | Q(author=user))
+        )
+        self.run(
+            'timeline', TimelineEntry.objects.filter(user=user),
+            lambda entry_ids: delete_rows(TimelineEntry, entry_ids),
+        )
+        bump_version(page_scope_key('profile', username=user.username))
+        # Связанных строк не осталось, каскад Django здесь дешевый.
+        user.delete()
+        bump_version(SITE_SCOPE_KEY)
+
+    def clear_group(self, group):
+        def detach_posts(ids):
+            Post.objects.filter(pk__in=ids).update(group=None)
+            for post_id in ids:
+                bump_version(post_version_key(post_id))
+
+        def detach_archived_posts(ids):
+            ArchivedPost.objects.filter(pk__in=ids).update(group=None)
+            for post_id in ids:
+                bump_version(post_version_key(post_id))
+
+        self.run('group posts', Post.objects.filter(group=group), detach_posts)
+        self.run(
+            'archived group posts', ArchivedPost.objects.filter(group=group),
+            detach_archived_posts,
+        )
+        group.delete()
+
+
+def delete_users(user_ids, batch_size=None):
+    """Фоновая задача для действия админки."""
+    deleter = BulkDeleter(batch_size)
+    for user in User.objects.filter(pk__in=user_ids):
+        deleter.delete_user(user)
+
+
+def delete_groups(group_ids, batch_size=None):
+    deleter = BulkDeleter(batch_size)
+    for group in Group.objects.filter(pk__in=group_ids):
+        deleter.clear_group(group)
+
+
+def delete_posts(post_ids, batch_size=None):
+    BulkDeleter(batch_size).delete_posts(Post.objects.filter(pk__in=post_ids))
+    bump_version(SITE_SCOPE_KEY)
+
+
+def delete_media(names):
+    """
+    Фоновая задача: файлы картинок удаленных записей с миниатюрами и
+    вариантами. Картинки хранятся по хешу содержимого, поэтому файл,
+    на который ссылается другая запись, остается.
+    """
+    for name in names:
+        if (
+            Post.objects.filter(image=name).exists()
+            or ArchivedPost.objects.filter(image=name).exists()
+        ):
+            continue
+        files = [name, thumbnail_name(name)]
+        for variant in image_variants(name):
+            files += [variant['jpeg'], variant['webp']]
+        for file_name in files:
+            default_storage.delete(file_name)
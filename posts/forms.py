@@ -2,14 +2,27 @@ from django import forms
 
 from . import constants
 from .models import Comment, Post
+from .uploads import upload_too_large_message
 
 
 class PostForm(forms.ModelForm):
     class Meta:
         model = Post
-        fields = ('group', 'text')
+        fields = ('group', 'text', 'image')
         labels = constants.form_post_labels
 
+    def __init__(self, *args, rejected_uploads=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rejected_uploads = rejected_uploads
+
+    def clean(self):
+        cleaned_data = super().clean()
+        # Обработчик загрузки отбросил файл, превысивший лимит.
+        for field in self.rejected_uploads:
+            if field in self.fields:
+                self.add_error(field, upload_too_large_message())
+        return cleaned_data
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,154 @@
+import base64
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from posts import constants
+from posts.cache import (SITE_SCOPE_KEY, bump_version, post_version_key,
+                         purge_post_pages)
+from posts.jobs import enqueue
+from posts.metrics import observe_duration
+from posts.timing import timed
+
+from .models import Post
+from .thumbnails import schedule_thumbnail
+
+INCOMING_DIR = 'posts/incoming/'
+
+
+def is_incoming(image_name):
+    return image_name.startswith(INCOMING_DIR)
+
+
+def normalize_image(source):
+    """
+    Поворачивает по EXIF, уменьшает до constants.image_max_size и
+    кодирует заново: метаданные (в том числе координаты съемки) в
+    результат не попадают. Возвращает байты и расширение.
+    """
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(constants.image_max_size, Image.LANCZOS)
+        buffer = BytesIO()
+        if image.mode in ('RGBA', 'LA') or (
+            image.mode == 'P' and 'transparency' in image.info
+        ):
+            image.convert('RGBA').save(buffer, 'PNG', optimize=True)
+            extension = 'png'
+        else:
+            image.convert('RGB').save(
+                buffer, 'JPEG',
+                quality=constants.image_quality, optimize=True,
+                icc_profile=image.info.get('icc_profile'),
+            )
+            extension = 'jpg'
+    return buffer.getvalue(), extension
+
+
+def image_metadata(source):
+    """
+    Размеры картинки и крошечное размытое превью в виде data URI.
+    Выполняется и в дочерних процессах: только Pillow, без Django ORM.
+    """
+    with Image.open(source) as image:
+        width, height = image.size
+        preview = image.convert('RGB')
+        preview.thumbnail(constants.placeholder_size, Image.BOX)
+    buffer = BytesIO()
+    preview.save(buffer, 'JPEG', quality=40)
+    placeholder = base64.b64encode(buffer.getvalue()).decode('ascii')
+    return {
+        'image_width': width,
+        'image_height': height,
+        'image_placeholder': f'data:image/jpeg;base64,{placeholder}',
+    }
+
+
+def content_name(data, extension):
+    digest = hashlib.sha256(data).hexdigest()
+    return f'posts/{digest[:2]}/{digest}.{extension}'
+
+
+def store_by_content(data, extension):
+    """
+    Сохраняет файл под именем из хеша содержимого; одинаковые картинки
+    занимают на диске один файл.
+    """
+    name = content_name(data, extension)
+    if default_storage.exists(name):
+        return name
+    saved = default_storage.save(name, ContentFile(data))
+    if saved != name:
+        # Тот же файл параллельно сохранил другой воркер.
+        default_storage.delete(saved)
+    return name
+
+
+def schedule_image_processing(post_id, image_name):
+    with timed('thumb'):
+        return enqueue(
+            process_image, post_id, image_name,
+            key=f'image:{post_id}:{image_name}',
+        )
+
+
+def process_image(post_id, image_name):
+    """Фоновая задача: нормализует загрузку и заменяет ее в записи."""
+    with default_storage.open(image_name) as source, observe_duration(
+        'yatube_thumbnail_duration_seconds', stage='normalize'
+    ):
+        data, extension = normalize_image(source)
+    name = store_by_content(data, extension)
+    with observe_duration(
+        'yatube_thumbnail_duration_seconds', stage='metadata'
+    ):
+        metadata = image_metadata(BytesIO(data))
+    if Post.objects.filter(pk=post_id, image=image_name).update(
+        image=name, **metadata
+    ):
+        schedule_thumbnail(post_id, name)
+        # Пока готовится миниатюра, карточка уже показывает превью.
+        bump_version(post_version_key(post_id))
+        purge_post_pages(Post.objects.feed().get(pk=post_id))
+    # Исходник больше не нужен, даже если запись успели изменить.
+    default_storage.delete(image_name)
+
+
+def process_in_pool(rows, submit, apply, workers, batch_size, errors):
+    """
+    Обрабатывает картинки записей из rows — пар (pk, image) — в пуле
+    процессов пачками по batch_size. submit(pool, image) отправляет
+    задачу в пул, apply(pk, image, result) сохраняет результат уже в
+    текущем процессе. Ошибки отдельных картинок передаются в errors и
+    не прерывают обработку. Возвращает число обработанных записей.
+    """
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                done += apply_batch(pool, batch, submit, apply, errors)
+                batch = []
+        if batch:
+            done += apply_batch(pool, batch, submit, apply, errors)
+    if done:
+        bump_version(SITE_SCOPE_KEY)
+    return done
+
+
+def apply_batch(pool, batch, submit, apply, errors):
+    futures = [(pk, image, submit(pool, image)) for pk, image in batch]
+    done = 0
+    for pk, image, future in futures:
+        if future.exception() is not None:
+            errors(f'Запись {pk}: {image}: {future.exception()}')
+            continue
+        apply(pk, image, future.result())
+        bump_version(post_version_key(pk))
+        done += 1
+    return done
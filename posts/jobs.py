@@ -0,0 +1,185 @@
+import json
+import logging
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import timedelta
+from multiprocessing import get_context
+
+import django
+from django.db import (IntegrityError, close_old_connections, connections,
+                       transaction)
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from posts import constants
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+def task_name(func):
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def enqueue(func, *args, key=None, max_attempts=None, delay=0):
+    """
+    Ставит вызов func(*args) в очередь.
+
+    Строка задачи пишется в той же транзакции, что и изменения, которые
+    ее породили, поэтому задача не потеряется и не выполнится для
+    откатившейся записи. Задача с уже известным ключом повторно не
+    ставится, пока она ждет в очереди или выполняется.
+    """
+    job = Job(
+        task=task_name(func),
+        args=json.dumps(args),
+        key=key,
+        max_attempts=max_attempts or constants.job_max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+    if key is None:
+        job.save()
+        return job
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        return Job.objects.get(key=key)
+    return job
+
+
+def claim_jobs(limit):
+    now = timezone.now()
+    stale = now - timedelta(seconds=constants.job_timeout_seconds)
+    candidates = Job.objects.filter(
+        Q(status=Job.PENDING, run_after__lte=now)
+        | Q(status=Job.RUNNING, started__lt=stale)
+    ).order_by('run_after', 'pk').values_list('pk', flat=True)[:limit]
+    claimed = [
+        pk for pk in candidates
+        # Условный UPDATE: из нескольких воркеров задачу получит один.
+        if Job.objects.filter(
+            Q(status=Job.PENDING) | Q(status=Job.RUNNING, started__lt=stale),
+            pk=pk,
+        ).update(status=Job.RUNNING, started=now)
+    ]
+    return list(
+        Job.objects.filter(pk__in=claimed).order_by('run_after', 'pk')
+    )
+
+
+def run_task(task, args):
+    import_string(task)(*json.loads(args))
+
+
+def run_worker_task(task, args):
+    """Выполняется в дочернем процессе runworker."""
+    try:
+        run_task(task, args)
+    finally:
+        close_old_connections()
+
+
+def finish_job(job, error=None):
+    job.attempts += 1
+    job.finished = timezone.now()
+    if error is None:
+        job.status = Job.DONE
+        job.error = ''
+    elif job.attempts < job.max_attempts:
+        job.status = Job.PENDING
+        job.error = error
+        job.run_after = job.finished + timedelta(
+            seconds=constants.job_retry_delay_seconds * 2 ** (job.attempts - 1)
+        )
+    else:
+        job.status = Job.FAILED
+        job.error = error
+        logger.error('Задача %s не выполнена: %s', job, error)
+    if job.status in (Job.DONE, Job.FAILED):
+        # Ключ защищает только от дублей в очереди: ту же задачу можно
+        # поставить снова, например для той же картинки после сбоя.
+        job.key = None
+    job.save(update_fields=[
+        'attempts', 'finished', 'status', 'error', 'run_after', 'key'
+    ])
+    return job
+
+
+def run_pending(limit=100):
+    """Выполняет готовые задачи в текущем процессе; для тестов и отладки."""
+    done = 0
+    for job in claim_jobs(limit):
+        try:
+            run_task(job.task, job.args)
+        except Exception:
+            finish_job(job, traceback.format_exc())
+        else:
+            finish_job(job)
+        done += 1
+    return done
+
+
+def work(workers, poll_interval, once=False):
+    """
+    Главный цикл runworker: забирает задачи и выполняет их в пуле
+    процессов, пока не останется свободных мест.
+    """
+    # Дочерние процессы запускаются начисто (spawn) и сами
+    # настраивают Django: унаследованные соединения SQLite небезопасны.
+    connections.close_all()
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=get_context('spawn'),
+        initializer=django.setup,
+    )
+    running = {}
+    with pool:
+        while True:
+            free = workers - len(running)
+            if free:
+                for job in claim_jobs(free):
+                    future = pool.submit(run_worker_task, job.task, job.args)
+                    running[future] = job
+            if not running:
+                if once:
+                    return
+                time.sleep(poll_interval)
+                continue
+            finished, _ = wait(
+                running, timeout=poll_interval, return_when=FIRST_COMPLETED
+            )
+            for future in finished:
+                job = running.pop(future)
+                error = future.exception()
+                finish_job(job, None if error is None else ''.join(
+                    traceback.format_exception(
+                        type(error), error, error.__traceback__
+                    )
+                ))
+
+
+def job_stats(since):
+    """Задержка в очереди и время выполнения по задачам, в секундах."""
+    stats = {}
+    jobs = Job.objects.filter(created__gte=since).values_list(
+        'task', 'status', 'created', 'started', 'finished'
+    )
+    for task, status, created, started, finished in jobs.iterator():
+        item = stats.setdefault(task, {
+            'statuses': {}, 'waits': [], 'runs': [],
+        })
+        item['statuses'][status] = item['statuses'].get(status, 0) + 1
+        if status == Job.DONE:
+            item['waits'].append((started - created).total_seconds())
+            item['runs'].append((finished - started).total_seconds())
+    return stats
+
+
+def purge_finished_jobs(older_than):
+    return Job.objects.filter(
+        status=Job.DONE, finished__lt=older_than
+    ).delete()[0]
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.archive import PostArchiver, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит записи старше POST_ARCHIVE_AFTER_DAYS дней вместе с '
+        'комментариями в архивные таблицы пачками в коротких транзакциях.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.POST_ARCHIVE_AFTER_DAYS
+        )
+        parser.add_argument('--batch-size', type=int)
+
+    def progress(self, stage, count):
+        self.stdout.write(f'{stage}: {count}')
+
+    def handle(self, *args, **options):
+        archiver = PostArchiver(options['batch_size'], progress=self.progress)
+        done = archiver.archive(archive_cutoff(options['days']))
+        self.stdout.write(f'Перенесено в архив записей: {done}')
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts.images import INCOMING_DIR, image_metadata, process_in_pool
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет размеры и превью изображений существующих записей '
+        'параллельно.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS
+        )
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересчитать и уже заполненные записи.'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image=None).exclude(
+            # Необработанные загрузки заполнит задача process_image.
+            image__startswith=INCOMING_DIR
+        )
+        if not options['force']:
+            posts = posts.filter(
+                Q(image_width=None) | Q(image_placeholder='')
+            )
+        done = process_in_pool(
+            posts.order_by('pk').values_list('pk', 'image').iterator(),
+            submit=lambda pool, image: pool.submit(
+                image_metadata, default_storage.path(image)
+            ),
+            apply=lambda pk, image, metadata: Post.objects.filter(
+                pk=pk, image=image
+            ).update(**metadata),
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            errors=self.stderr.write,
+        )
+        self.stdout.write(f'Обработано изображений: {done}')
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from posts.cache import SITE_SCOPE_KEY, bump_version
+from posts.deletion import BulkDeleter
+from posts.models import Group, Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет пользователей, сообщества и записи вместе со связанными '
+        'строками пачками в коротких транзакциях.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', nargs='+', default=[], metavar='USERNAME'
+        )
+        parser.add_argument('--groups', nargs='+', default=[], metavar='SLUG')
+        parser.add_argument('--posts', nargs='+', type=int, default=[])
+        parser.add_argument('--batch-size', type=int)
+
+    def progress(self, stage, count):
+        self.stdout.write(f'{stage}: {count}')
+
+    def handle(self, *args, **options):
+        deleter = BulkDeleter(options['batch_size'], progress=self.progress)
+        if options['posts']:
+            deleter.delete_posts(Post.objects.filter(pk__in=options['posts']))
+            bump_version(SITE_SCOPE_KEY)
+        for group in Group.objects.filter(slug__in=options['groups']):
+            deleter.clear_group(group)
+            self.stdout.write(f'Удалено сообщество {group.slug}')
+        for user in User.objects.filter(username__in=options['users']):
+            deleter.delete_user(user)
+            self.stdout.write(f'Удален пользователь {user.username}')
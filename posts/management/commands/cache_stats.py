@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts.cache import get_hit_ratio
+
+CACHE_LAYERS = {
+    'post_card': 'Фрагменты записей',
+    'page': 'Страницы лент для анонимов',
+    'count': 'Число записей в лентах',
+}
+
+
+class Command(BaseCommand):
+    help = 'Выводит число попаданий и промахов для каждого уровня кеша.'
+
+    def handle(self, *args, **options):
+        for prefix, title in CACHE_LAYERS.items():
+            hits, misses, ratio = get_hit_ratio(prefix)
+            self.stdout.write(
+                f'{title}: попаданий {hits}, промахов {misses}, '
+                f'доля попаданий {ratio:.1%}'
+            )
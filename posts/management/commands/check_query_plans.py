@@ -0,0 +1,86 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from posts import constants
+from posts.models import (ArchivedComment, ArchivedPost, Comment, Post,
+                          TimelineEntry)
+from posts.paginators import CursorPaginator, WindowedPaginator
+from posts.timelines import keyset
+
+
+def feed_querysets():
+    now = timezone.now()
+    feeds = {
+        'index': Post.objects.feed(),
+        'group_posts': Post.objects.feed().filter(group_id=0),
+        'profile': Post.objects.feed().filter(author_id=0),
+        'group_posts archive': ArchivedPost.objects.feed().filter(
+            group_id=0
+        ),
+        'profile archive': ArchivedPost.objects.feed().filter(author_id=0),
+    }
+    for name, queryset in feeds.items():
+        paginator = CursorPaginator(queryset, constants.posts_per_page)
+        yield name, paginator.queryset_after()
+        yield f'{name} ?after=', paginator.queryset_after(now, 0)
+        yield f'{name} ?before=', paginator.queryset_before(now, 0)
+        numbered = WindowedPaginator(queryset, constants.posts_per_page)
+        yield f'{name} ?page=', numbered.object_list[
+            constants.posts_per_page:constants.posts_per_page * 2
+        ]
+        yield f'{name} count', numbered.object_list.order_by().values('pk')
+    comments = CursorPaginator(
+        Comment.objects.filter(post_id=0).select_related('author'),
+        constants.comments_per_page, key='created',
+    )
+    archived_comments = CursorPaginator(
+        ArchivedComment.objects.filter(post_id=0).select_related('author'),
+        constants.comments_per_page, key='created',
+    )
+    timeline = TimelineEntry.objects.filter(user_id=0)
+    yield 'follow_index', keyset(
+        timeline, 'post_id', None, None, True, constants.posts_per_page
+    )
+    yield 'add_comment', comments.queryset_after()
+    yield 'post_comments ?after=', comments.queryset_after(now, 0)
+    yield 'archived post_comments ?after=', archived_comments.queryset_after(
+        now, 0
+    )
+
+
+def is_bad_step(detail):
+    if 'TEMP B-TREE' in detail:
+        return True
+    return detail.startswith('SCAN') and 'USING' not in detail
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверяет EXPLAIN QUERY PLAN запросов лент и завершается '
+        'с ошибкой, если какой-либо из них читает таблицу целиком '
+        'или сортирует во временном B-дереве.'
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда поддерживает только SQLite.')
+        failed = []
+        for name, queryset in feed_querysets():
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = [row[-1] for row in cursor.fetchall()]
+            bad_steps = [detail for detail in plan if is_bad_step(detail)]
+            if bad_steps:
+                failed.append(name)
+                self.stdout.write(self.style.ERROR(f'{name}:'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{name}:'))
+            for detail in plan:
+                self.stdout.write(f'    {detail}')
+        if failed:
+            raise CommandError(
+                'Полный просмотр или временная сортировка в запросах: '
+                + ', '.join(failed)
+            )
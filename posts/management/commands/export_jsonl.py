@@ -0,0 +1,39 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts.transfer import MODELS, dump_records
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает сообщества, записи и комментарии, вместе с архивными, '
+        'в JSONL потоком, не загружая таблицы в память.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output', nargs='?', default='-',
+            help='Файл для выгрузки, по умолчанию stdout.'
+        )
+        parser.add_argument(
+            '--models', nargs='+', choices=MODELS, default=MODELS
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        models = [name for name in MODELS if name in options['models']]
+
+        def progress(name, total, rate):
+            self.stderr.write(f'{name}: всего {total} строк, {rate:.0f} строк/с')
+
+        if options['output'] == '-':
+            total = dump_records(
+                models, sys.stdout, options['chunk_size'], progress
+            )
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                total = dump_records(
+                    models, output, options['chunk_size'], progress
+                )
+        self.stderr.write(self.style.SUCCESS(f'Выгружено строк: {total}'))
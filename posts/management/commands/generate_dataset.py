@@ -0,0 +1,171 @@
+import os
+import random
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from posts.cache import SITE_SCOPE_KEY, bump_version
+from posts.models import Comment, Group, Post, User
+from posts.transfer import explicit_dates
+
+WORDS = (
+    'сообщество запись новости город погода музыка книга фильм путешествие '
+    'кошка собака утро вечер работа отпуск проект код тест релиз ошибка '
+    'друзья встреча фото море горы лес река снег солнце дождь кофе чай'
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает воспроизводимый набор данных заданного размера для '
+        'нагрузочных замеров: пользователей, сообщества, записи '
+        '(часть с изображениями) и комментарии.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=30000)
+        parser.add_argument(
+            '--image-ratio', type=float, default=0.1,
+            help='Доля записей с изображением.'
+        )
+        parser.add_argument('--images', type=int, default=20,
+                            help='Сколько разных файлов изображений создать.')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней распределить даты.')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.start = timezone.make_aware(datetime(2020, 1, 1))
+        self.span = timedelta(days=options['days']).total_seconds()
+
+        users = self.create_users(options['users'])
+        groups = self.create_groups(options['groups'])
+        images = self.create_images(options['images'])
+        posts = self.create_posts(
+            options['posts'], users, groups, images, options['image_ratio']
+        )
+        self.create_comments(options['comments'], users, posts)
+        call_command('reconcile_counters', stdout=self.stdout)
+        bump_version(SITE_SCOPE_KEY)
+        self.stdout.write(self.style.SUCCESS('Набор данных создан.'))
+
+    def text(self, words):
+        return ' '.join(self.random.choice(WORDS) for _ in range(words))
+
+    def bulk(self, model, objects):
+        created = 0
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) == self.batch_size:
+                created += self.flush(model, batch)
+                batch = []
+        if batch:
+            created += self.flush(model, batch)
+        self.stdout.write(f'{model._meta.verbose_name_plural}: {created}')
+
+    def flush(self, model, batch):
+        with transaction.atomic():
+            model.objects.bulk_create(batch)
+        return len(batch)
+
+    def create_users(self, count):
+        password = make_password(None)
+        first_pk = (User.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0) + 1
+        self.bulk(User, (
+            User(username=f'user{first_pk + n:07d}', password=password,
+                 first_name=self.random.choice(WORDS).title())
+            for n in range(count)
+        ))
+        return list(User.objects.filter(pk__gte=first_pk).values_list(
+            'pk', flat=True
+        ))
+
+    def create_groups(self, count):
+        first_pk = (Group.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0) + 1
+        self.bulk(Group, (
+            Group(title=self.text(2).title(), slug=f'group-{first_pk + n}',
+                  description=self.text(20))
+            for n in range(count)
+        ))
+        return list(Group.objects.filter(pk__gte=first_pk).values_list(
+            'pk', flat=True
+        ))
+
+    def create_images(self, count):
+        directory = os.path.join(settings.MEDIA_ROOT, 'posts', 'dataset')
+        os.makedirs(directory, exist_ok=True)
+        names = []
+        for n in range(count):
+            name = f'posts/dataset/image{n}.jpg'
+            color = tuple(self.random.randrange(256) for _ in range(3))
+            Image.new('RGB', (1280, 720), color).save(
+                os.path.join(settings.MEDIA_ROOT, name), 'JPEG'
+            )
+            names.append(name)
+        return names
+
+    def moment(self, after=None):
+        if after is None:
+            return self.start + timedelta(
+                seconds=self.random.uniform(0, self.span)
+            )
+        return after + timedelta(seconds=self.random.uniform(0, 86400))
+
+    def create_posts(self, count, users, groups, images, image_ratio):
+        posts = sorted(
+            (self.moment(), self.random.choice(users)) for _ in range(count)
+        )
+        first_pk = (Post.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0) + 1
+        with explicit_dates(Post._meta.get_field('pub_date')):
+            self.bulk(Post, (
+                Post(
+                    text=self.text(self.random.randint(5, 80)),
+                    pub_date=pub_date,
+                    author_id=author_id,
+                    group_id=(self.random.choice(groups)
+                              if groups and self.random.random() < 0.7
+                              else None),
+                    image=(self.random.choice(images)
+                           if images and self.random.random() < image_ratio
+                           else None),
+                )
+                for pub_date, author_id in posts
+            ))
+        return list(Post.objects.filter(pk__gte=first_pk).values_list(
+            'pk', 'pub_date'
+        ))
+
+    def create_comments(self, count, users, posts):
+        if not posts:
+            return
+        with explicit_dates(Comment._meta.get_field('created')):
+            self.bulk(Comment, (
+                Comment(
+                    post_id=post_id,
+                    author_id=self.random.choice(users),
+                    text=self.text(self.random.randint(3, 30)),
+                    created=self.moment(after=pub_date),
+                )
+                for post_id, pub_date in (
+                    self.random.choice(posts) for _ in range(count)
+                )
+            ))
@@ -0,0 +1,55 @@
+import json
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from posts.images import INCOMING_DIR, process_in_pool
+from posts.models import Post
+from posts.thumbnails import (image_variants, render_variants, save_variants,
+                              thumbnail_name)
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает недостающие миниатюры и варианты изображений записей '
+        'параллельно.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS
+        )
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать и уже готовые миниатюры.'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image=None).exclude(
+            # Необработанные загрузки заменит задача process_image.
+            image__startswith=INCOMING_DIR
+        )
+        posts = posts.order_by('pk').values_list(
+            'pk', 'image', 'thumbnail', 'image_variants'
+        )
+        force = options['force']
+        rows = (
+            (pk, image)
+            for pk, image, thumbnail, variants in posts.iterator()
+            if force or thumbnail != thumbnail_name(image) or (
+                variants != json.dumps(image_variants(image))
+            )
+        )
+        done = process_in_pool(
+            rows,
+            submit=lambda pool, image: pool.submit(
+                render_variants, default_storage.path(image), image, force
+            ),
+            apply=lambda pk, image, result: save_variants(pk, image),
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            errors=self.stderr.write,
+        )
+        self.stdout.write(f'Создано миниатюр: {done}')
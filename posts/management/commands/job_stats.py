@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.jobs import job_stats
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[max(round(percent / 100 * len(ordered)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает по каждой задаче число выполненных и упавших запусков, '
+        'задержку в очереди и время выполнения (p50/p95).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=int, default=24,
+            help='За сколько последних часов считать.'
+        )
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(hours=options['hours'])
+        for task, item in sorted(job_stats(since).items()):
+            statuses = ', '.join(
+                f'{status}: {count}'
+                for status, count in sorted(item['statuses'].items())
+            )
+            self.stdout.write(f'{task} ({statuses})')
+            for label, values in (('очередь', item['waits']),
+                                  ('выполнение', item['runs'])):
+                if values:
+                    self.stdout.write(
+                        f'    {label}: p50 {percentile(values, 50):.3f} с, '
+                        f'p95 {percentile(values, 95):.3f} с'
+                    )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Заново строит полнотекстовый индекс записей пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Полнотекстовый поиск работает только в SQLite.')
+        indexed = rebuild_search_index(
+            options['batch_size'],
+            progress=lambda count: self.stdout.write(
+                f'Проиндексировано записей: {count}'
+            ),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс перестроен, записей: {indexed}'
+        ))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from posts.counters import (reconcile_author_counters,
+                            reconcile_comment_counts,
+                            reconcile_group_counters)
+from posts.models import Group, Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счетчики комментариев, записей '
+        'авторов и сообществ и подписок пачками по диапазонам первичных '
+        'ключей.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def reconcile(self, model, reconcile_range, batch_size):
+        last_pk = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        fixed = 0
+        for first in range(1, last_pk + 1, batch_size):
+            with transaction.atomic():
+                fixed += reconcile_range(first, first + batch_size - 1)
+        return fixed
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fixed_posts = self.reconcile(
+            Post, reconcile_comment_counts, batch_size
+        )
+        fixed_authors = self.reconcile(
+            User, reconcile_author_counters, batch_size
+        )
+        fixed_groups = self.reconcile(
+            Group, reconcile_group_counters, batch_size
+        )
+        self.stdout.write(
+            f'Исправлено счетчиков комментариев: {fixed_posts}, '
+            f'счетчиков авторов: {fixed_authors}, '
+            f'счетчиков сообществ: {fixed_groups}'
+        )
@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from yatube.db_router import copy_database
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite во все реплики из '
+        'DATABASE_REPLICAS. Заменяет настоящую репликацию при локальной '
+        'работе; с --interval повторяет копирование в цикле.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Пауза между копированиями в секундах; 0 — один раз.'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError(
+                'Реплики не настроены: задайте DATABASE_REPLICA_FILES.'
+            )
+        if options['interval'] > settings.REPLICA_MAX_LAG_SECONDS:
+            self.stderr.write(
+                'Интервал больше REPLICA_MAX_LAG_SECONDS: страницы с '
+                'отстающих реплик могут попасть в кеш устаревшими.'
+            )
+        source = connections['default'].settings_dict['NAME']
+        while True:
+            for alias in settings.DATABASE_REPLICAS:
+                copy_database(source, connections[alias].settings_dict['NAME'])
+            self.stdout.write(
+                f'Реплик обновлено: {len(settings.DATABASE_REPLICAS)}'
+            )
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
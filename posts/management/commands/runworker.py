@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.jobs import purge_finished_jobs, work
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет фоновые задачи из таблицы очереди в пуле процессов. '
+        'Неудачные задачи повторяются с растущей паузой.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.JOB_WORKERS
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1,
+            help='Пауза в секундах, когда очередь пуста.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и завершиться.'
+        )
+        parser.add_argument(
+            '--keep-days', type=int, default=7,
+            help='Сколько дней хранить выполненные задачи.'
+        )
+
+    def handle(self, *args, **options):
+        purged = purge_finished_jobs(
+            timezone.now() - timedelta(days=options['keep_days'])
+        )
+        self.stdout.write(f'Удалено выполненных задач: {purged}')
+        work(options['workers'], options['poll_interval'], options['once'])
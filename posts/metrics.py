@@ -0,0 +1,258 @@
+"""
+Метрики в текстовом формате Prometheus.
+
+Счетчики, гистограммы и датчики хранятся в отдельном файле SQLite
+(METRICS_PATH) и потому общие для всех процессов gunicorn и воркеров
+очереди: /metrics из любого процесса отдает сумму по всем. Приращения
+за время запроса копятся в памяти и записываются одной транзакцией
+в конце, вне запроса каждое приращение пишется сразу.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+THUMBNAIL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Имя: (тип, описание, границы корзин гистограммы).
+METRICS = {
+    'yatube_http_requests_total': (
+        'counter', 'HTTP requests by URL name, method and status.', None,
+    ),
+    'yatube_http_request_duration_seconds': (
+        'histogram', 'HTTP request latency by URL name.', LATENCY_BUCKETS,
+    ),
+    'yatube_http_requests_in_flight': (
+        'gauge', 'HTTP requests being processed right now.', None,
+    ),
+    'yatube_db_queries_per_request': (
+        'histogram', 'SQL queries per HTTP request by URL name.',
+        QUERY_COUNT_BUCKETS,
+    ),
+    'yatube_cache_requests_total': (
+        'counter', 'Cache lookups by cache layer and result.', None,
+    ),
+    'yatube_thumbnail_duration_seconds': (
+        'histogram', 'Image processing time by stage.', THUMBNAIL_BUCKETS,
+    ),
+}
+
+_local = threading.local()
+_stores = {}
+
+
+class MetricsStore:
+    """
+    Таблица сэмплов в SQLite в режиме WAL. Приращения складываются
+    UPSERT'ом внутри BEGIN IMMEDIATE, то есть атомарно между процессами.
+    Датчики хранятся отдельно для каждого процесса: строки завершившихся
+    процессов не учитываются и удаляются при чтении.
+    """
+
+    def __init__(self, path, busy_timeout=5):
+        self._path = path
+        self._busy_timeout = busy_timeout
+        self._local = threading.local()
+
+    @property
+    def _connection(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = self._connect()
+            local.pid = os.getpid()
+        return local.connection
+
+    def _connect(self):
+        connection = sqlite3.connect(
+            self._path, timeout=self._busy_timeout, isolation_level=None
+        )
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute('''
+            CREATE TABLE IF NOT EXISTS samples (
+                metric TEXT NOT NULL,
+                labels TEXT NOT NULL,
+                sample TEXT NOT NULL,
+                pid INTEGER NOT NULL,
+                value REAL NOT NULL,
+                PRIMARY KEY (metric, labels, sample, pid)
+            )
+        ''')
+        return connection
+
+    def add(self, samples):
+        """samples — пары ((metric, labels, sample, pid), приращение)."""
+        rows = [(*key, value) for key, value in samples]
+        if not rows:
+            return
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                'INSERT INTO samples (metric, labels, sample, pid, value) '
+                'VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (metric, labels, sample, pid) '
+                'DO UPDATE SET value = value + excluded.value',
+                rows,
+            )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def collect(self):
+        """Суммы по всем процессам: {metric: {labels: {sample: value}}}."""
+        rows = self._connection.execute(
+            'SELECT metric, labels, sample, pid, value FROM samples'
+        ).fetchall()
+        dead = {pid for *_, pid, _ in rows if pid and not pid_alive(pid)}
+        if dead:
+            placeholders = ', '.join('?' * len(dead))
+            self._connection.execute(
+                f'DELETE FROM samples WHERE pid IN ({placeholders})',
+                list(dead),
+            )
+        values = defaultdict(lambda: defaultdict(lambda: defaultdict(float)))
+        for metric, labels, sample, pid, value in rows:
+            if pid not in dead:
+                values[metric][labels][sample] += value
+        return values
+
+    def clear(self):
+        self._connection.execute('DELETE FROM samples')
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def get_store():
+    path = settings.METRICS_PATH
+    if path not in _stores:
+        _stores[path] = MetricsStore(path)
+    return _stores[path]
+
+
+def format_labels(labels):
+    def escape(value):
+        return (
+            str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n')
+        )
+
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels)
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def write(samples):
+    batch = getattr(_local, 'batch', None)
+    if batch is not None:
+        for key, value in samples:
+            batch[key] += value
+        return
+    try:
+        get_store().add(samples)
+    except sqlite3.Error:
+        # Метрики не должны ронять запрос или фоновую задачу.
+        logger.exception('Не удалось записать метрики')
+
+
+@contextmanager
+def collect_metrics():
+    """Копит приращения и записывает их одной транзакцией в конце."""
+    previous = getattr(_local, 'batch', None)
+    _local.batch = batch = defaultdict(float)
+    try:
+        yield batch
+    finally:
+        _local.batch = previous
+        write(list(batch.items()))
+
+
+def inc(metric, value=1, **labels):
+    write([((metric, format_labels(labels.items()), '', 0), value)])
+
+
+def gauge_add(metric, value, **labels):
+    write([((metric, format_labels(labels.items()), '', os.getpid()), value)])
+
+
+def observe(metric, value, **labels):
+    buckets = METRICS[metric][2]
+    key = (metric, format_labels(labels.items()))
+    write([
+        *(((*key, format_value(bound), 0), 1)
+          for bound in (*buckets, float('inf')) if value <= bound),
+        ((*key, 'sum', 0), value),
+        ((*key, 'count', 0), 1),
+    ])
+
+
+@contextmanager
+def observe_duration(metric, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(metric, time.perf_counter() - started, **labels)
+
+
+def counter_value(metric, **labels):
+    values = get_store().collect()
+    return values.get(metric, {}).get(
+        format_labels(labels.items()), {}
+    ).get('', 0)
+
+
+def render_metrics():
+    values = get_store().collect()
+    lines = []
+    for metric, (kind, description, buckets) in METRICS.items():
+        lines.append(f'# HELP {metric} {description}')
+        lines.append(f'# TYPE {metric} {kind}')
+        for labels, samples in sorted(values.get(metric, {}).items()):
+            if kind != 'histogram':
+                lines.append(
+                    f'{metric}{{{labels}}} {format_value(samples[""])}'
+                    if labels else f'{metric} {format_value(samples[""])}'
+                )
+                continue
+            prefix = f'{labels},' if labels else ''
+            for bound in (*buckets, float('inf')):
+                le = format_value(bound)
+                lines.append(
+                    f'{metric}_bucket{{{prefix}le="{le}"}} '
+                    f'{format_value(samples.get(le, 0))}'
+                )
+            suffix = f'{{{labels}}}' if labels else ''
+            lines.append(
+                f'{metric}_sum{suffix} {format_value(samples["sum"])}'
+            )
+            lines.append(
+                f'{metric}_count{suffix} {format_value(samples["count"])}'
+            )
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,191 @@
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe, urlencode
+
+from posts import constants
+from posts.cache import count_event, page_key
+from posts.metrics import collect_metrics, gauge_add, inc, observe
+from posts.timing import (collect_timings, current_timings,
+                          install_template_timing)
+
+timing_logger = logging.getLogger('posts.timing')
+
+CACHED_PAGES = ('index', 'group_posts', 'profile')
+PAGE_PARAMS = ('page', 'after', 'before')
+TIMING_METRICS = ('db', 'tpl', 'thumb')
+
+
+class ServerTimingMiddleware:
+    """
+    Замеряет время SQL, рендеринга шаблонов и работы с миниатюрами.
+
+    Итог отдается в заголовке Server-Timing и пишется одной строкой
+    в лог posts.timing. Запросы к БД считаются через execute_wrapper,
+    шаблоны — через обертку Template.render, поэтому накладные расходы
+    сводятся к нескольким вызовам perf_counter на запрос.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install_template_timing()
+
+    def __call__(self, request):
+        with collect_timings() as timings, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timings))
+            response = self.get_response(request)
+        total = timings.elapsed()
+        response['Server-Timing'] = self.server_timing(timings, total)
+        if timing_logger.isEnabledFor(logging.INFO):
+            self.log(request, response, timings, total)
+        return response
+
+    def server_timing(self, timings, total):
+        # Значение заголовка должно быть в latin-1, поэтому описания
+        # метрик не локализуются.
+        metrics = [
+            f'{name};dur={timings.durations[name] * 1000:.1f}'
+            for name in TIMING_METRICS if name in timings.counts
+        ]
+        if 'db' in timings.counts:
+            metrics[0] += f';desc="{timings.counts["db"]} queries"'
+        metrics.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(metrics)
+
+    def log(self, request, response, timings, total):
+        match = request.resolver_match
+        timing_logger.info(
+            'view=%s method=%s status=%s total_ms=%.1f queries=%d '
+            'db_ms=%.1f tpl_ms=%.1f thumb_ms=%.1f',
+            match.url_name if match else '-',
+            request.method,
+            response.status_code,
+            total * 1000,
+            timings.counts['db'],
+            timings.durations['db'] * 1000,
+            timings.durations['tpl'] * 1000,
+            timings.durations['thumb'] * 1000,
+        )
+
+
+class MetricsMiddleware:
+    """
+    Считает запросы, их длительность и число SQL-запросов по имени URL.
+
+    Стоит сразу за ServerTimingMiddleware и берет из ее замеров время
+    и число запросов к БД. Все приращения запроса, включая попадания в
+    кеши, записываются в общее хранилище одной транзакцией.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Запрос виден как выполняющийся, пока не закончится.
+        gauge_add('yatube_http_requests_in_flight', 1)
+        with collect_metrics():
+            try:
+                response = self.get_response(request)
+                self.record(request, response)
+            finally:
+                gauge_add('yatube_http_requests_in_flight', -1)
+        return response
+
+    def record(self, request, response):
+        view = self.view_name(request)
+        inc(
+            'yatube_http_requests_total', view=view,
+            method=request.method, status=response.status_code,
+        )
+        timings = current_timings()
+        if timings is None:
+            return
+        observe(
+            'yatube_http_request_duration_seconds', timings.elapsed(),
+            view=view,
+        )
+        observe(
+            'yatube_db_queries_per_request', timings.counts.get('db', 0),
+            view=view,
+        )
+
+    def view_name(self, request):
+        # Страницы из кеша отдаются до разрешения URL представлением.
+        match = request.resolver_match
+        if match is None:
+            try:
+                match = resolve(request.path_info)
+            except Resolver404:
+                return 'unresolved'
+        return match.url_name or 'unnamed'
+
+
+class AnonymousPageCacheMiddleware:
+    """
+    Отдает ленты анонимным читателям из кеша, не обращаясь к БД.
+
+    Ключ страницы включает URL, курсор пагинации и версию ленты,
+    которую повышают представления, изменяющие записи и комментарии.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = self.get_cache_key(request)
+        if key is None:
+            return self.get_response(request)
+        cached = cache.get(key)
+        if cached is not None:
+            count_event('page:hits')
+            content, content_type, etag, last_modified = cached
+            response = HttpResponse(content, content_type=content_type)
+            response['ETag'] = etag
+            response['Last-Modified'] = last_modified
+            return get_conditional_response(
+                request,
+                etag=etag,
+                last_modified=parse_http_date_safe(last_modified),
+                response=response,
+            )
+        count_event('page:misses')
+        response = self.get_response(request)
+        if self.is_cacheable_response(response):
+            cache.set(
+                key,
+                (response.content, response['Content-Type'],
+                 response['ETag'], response['Last-Modified']),
+                constants.page_cache_seconds,
+            )
+        return response
+
+    def get_cache_key(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        if settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        if match.url_name not in CACHED_PAGES:
+            return None
+        query = urlencode([
+            (name, request.GET[name])
+            for name in PAGE_PARAMS if name in request.GET
+        ])
+        return page_key(match.url_name, match.kwargs, query)
+
+    def is_cacheable_response(self, response):
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+        )
@@ -0,0 +1,54 @@
+# Generated by Django 2.2.28 on 2026-10-18 03:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field, outer):
+    counts = model.objects.filter(**{field: OuterRef(outer)}).order_by(
+    ).values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    AuthorCounter = apps.get_model('posts', 'AuthorCounter')
+    Post.objects.update(comment_count=count_subquery(Comment, 'post', 'pk'))
+    AuthorCounter.objects.bulk_create(
+        AuthorCounter(user_id=pk) for pk in
+        Post.objects.order_by().values_list('author_id', flat=True).distinct()
+    )
+    AuthorCounter.objects.update(
+        posts_count=count_subquery(Post, 'author', 'user')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0003_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counter', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Количество записей')),
+            ],
+            options={
+                'verbose_name_plural': 'Счетчики авторов',
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
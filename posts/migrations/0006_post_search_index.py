@@ -0,0 +1,18 @@
+from django.db import migrations
+
+from ._search_index import CREATE_SEARCH_INDEX, DROP_SEARCH_INDEX, run_sqlite
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_post_thumbnail'),
+    ]
+
+    operations = [
+        # Индекс создается пустым: существующие записи индексирует
+        # команда rebuild_search_index.
+        migrations.RunPython(
+            run_sqlite(CREATE_SEARCH_INDEX), run_sqlite(DROP_SEARCH_INDEX)
+        ),
+    ]
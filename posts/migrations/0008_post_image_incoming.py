@@ -0,0 +1,22 @@
+# Generated by Django 2.2.28 on 2026-10-18 03:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_job'),
+    ]
+
+    # upload_to в схеме базы не отражается, а AlterField в SQLite
+    # пересоздал бы таблицу и потерял триггеры поискового индекса.
+    operations = [
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='post',
+                name='image',
+                field=models.ImageField(blank=True, help_text='Не обязательное поле', null=True, upload_to='posts/incoming/', verbose_name='Изображение'),
+            ),
+        ]),
+    ]
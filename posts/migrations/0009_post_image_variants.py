@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-18 04:00
+
+from django.db import migrations, models
+
+from ._search_index import DROP_SEARCH_TRIGGERS, SEARCH_TRIGGERS, run_sqlite
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_post_image_incoming'),
+    ]
+
+    # SQLite добавляет столбец, пересоздавая таблицу, и триггеры
+    # поискового индекса пропали бы вместе со старой таблицей.
+    operations = [
+        migrations.RunPython(
+            run_sqlite(DROP_SEARCH_TRIGGERS), run_sqlite(SEARCH_TRIGGERS)
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_variants',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Варианты изображения (JSON)'),
+        ),
+        migrations.RunPython(
+            run_sqlite(SEARCH_TRIGGERS), run_sqlite(DROP_SEARCH_TRIGGERS)
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 2.2.28 on 2026-10-18 04:01
+
+from django.db import migrations, models
+
+from ._search_index import DROP_SEARCH_TRIGGERS, SEARCH_TRIGGERS, run_sqlite
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_post_image_variants'),
+    ]
+
+    # Как и в 0009: SQLite пересоздает таблицу, триггеры нужно вернуть.
+    operations = [
+        migrations.RunPython(
+            run_sqlite(DROP_SEARCH_TRIGGERS), run_sqlite(SEARCH_TRIGGERS)
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота изображения'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_placeholder',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Превью изображения (data URI)'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина изображения'),
+        ),
+        migrations.RunPython(
+            run_sqlite(SEARCH_TRIGGERS), run_sqlite(DROP_SEARCH_TRIGGERS)
+        ),
+    ]
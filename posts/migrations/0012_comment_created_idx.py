@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 04:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_follow_timeline'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['created', 'id'], name='comment_created_idx'),
+        ),
+    ]
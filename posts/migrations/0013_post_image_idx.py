@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 04:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_comment_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['image'], name='post_image_idx'),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 2.2.28 on 2026-10-18 04:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import posts.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0013_post_image_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorcounter',
+            name='archived_posts_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Записей в архиве'),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='archived_posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Записей в архиве'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedPost',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('text', models.TextField(verbose_name='Текст')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('image', models.ImageField(blank=True, null=True, upload_to='', verbose_name='Изображение')),
+                ('thumbnail', models.ImageField(blank=True, upload_to='', verbose_name='Миниатюра')),
+                ('image_variants', models.TextField(blank=True, default='', verbose_name='Варианты изображения (JSON)')),
+                ('image_width', models.PositiveIntegerField(blank=True, null=True, verbose_name='Ширина изображения')),
+                ('image_height', models.PositiveIntegerField(blank=True, null=True, verbose_name='Высота изображения')),
+                ('image_placeholder', models.TextField(blank=True, default='', verbose_name='Превью изображения (data URI)')),
+                ('comment_count', models.PositiveIntegerField(default=0, verbose_name='Количество комментариев')),
+                ('author', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('group', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='posts.Group', verbose_name='Сообщество')),
+            ],
+            options={
+                'verbose_name_plural': 'Архив записей',
+                'ordering': ['-pub_date'],
+            },
+            bases=(posts.models.PostImageMixin, models.Model),
+        ),
+        migrations.CreateModel(
+            name='ArchivedComment',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('text', models.TextField(verbose_name='Текст')),
+                ('created', models.DateTimeField(verbose_name='Дата комментария')),
+                ('author', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('post', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='comments', to='posts.ArchivedPost', verbose_name='Запись')),
+            ],
+            options={
+                'verbose_name_plural': 'Архив комментариев',
+                'ordering': ['-created'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedpost',
+            index=models.Index(fields=['pub_date', 'id'], name='archived_post_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedpost',
+            index=models.Index(fields=['group', 'pub_date', 'id'], name='archived_post_group_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedpost',
+            index=models.Index(fields=['author', 'pub_date', 'id'], name='archived_post_author_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedpost',
+            index=models.Index(fields=['image'], name='archived_post_image_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedcomment',
+            index=models.Index(fields=['post', 'created', 'id'], name='archived_comment_post_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 2.2.28 on 2026-10-18 04:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field, outer):
+    counts = model.objects.filter(**{field: OuterRef(outer)}).order_by(
+    ).values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def fill_group_counters(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    GroupCounter = apps.get_model('posts', 'GroupCounter')
+    Post = apps.get_model('posts', 'Post')
+    ArchivedPost = apps.get_model('posts', 'ArchivedPost')
+    GroupCounter.objects.bulk_create(
+        GroupCounter(group_id=pk)
+        for pk in Group.objects.values_list('pk', flat=True)
+    )
+    archived = count_subquery(ArchivedPost, 'group', 'group')
+    GroupCounter.objects.update(
+        posts_count=count_subquery(Post, 'group', 'group') + archived,
+        archived_posts_count=archived,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupCounter',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counter', serialize=False, to='posts.Group', verbose_name='Сообщество')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Количество записей')),
+                ('archived_posts_count', models.PositiveIntegerField(default=0, verbose_name='Записей в архиве')),
+            ],
+            options={
+                'verbose_name_plural': 'Счетчики сообществ',
+            },
+        ),
+        migrations.RunPython(fill_group_counters, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='group',
+            name='archived_posts_count',
+        ),
+    ]
@@ -0,0 +1,52 @@
+"""
+SQL поискового индекса FTS5 для миграций.
+
+Триггеры держат posts_post_fts в соответствии с posts_post. SQLite
+добавляет и меняет столбцы, пересоздавая таблицу, и триггеры пропадают
+вместе со старой таблицей, поэтому миграции, меняющие Post, снимают их
+до операции и создают заново после.
+"""
+
+SEARCH_TRIGGERS = [
+    '''CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post BEGIN
+        INSERT INTO posts_post_fts (rowid, text) VALUES (new.id, new.text);
+    END''',
+    '''CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post BEGIN
+        INSERT INTO posts_post_fts (posts_post_fts, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END''',
+    '''CREATE TRIGGER posts_post_fts_update AFTER UPDATE OF text ON posts_post
+    BEGIN
+        INSERT INTO posts_post_fts (posts_post_fts, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO posts_post_fts (rowid, text) VALUES (new.id, new.text);
+    END''',
+]
+
+DROP_SEARCH_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS posts_post_fts_insert',
+    'DROP TRIGGER IF EXISTS posts_post_fts_delete',
+    'DROP TRIGGER IF EXISTS posts_post_fts_update',
+]
+
+CREATE_SEARCH_INDEX = [
+    '''CREATE VIRTUAL TABLE posts_post_fts USING fts5(
+        text, content='posts_post', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )''',
+    *SEARCH_TRIGGERS,
+]
+
+DROP_SEARCH_INDEX = [
+    *DROP_SEARCH_TRIGGERS,
+    'DROP TABLE IF EXISTS posts_post_fts',
+]
+
+
+def run_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
@@ -1,5 +1,8 @@
+import json
+
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -20,7 +23,30 @@ class Group(models.Model):
         return self.title
 
 
-class Post(models.Model):
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        return self.select_related('author', 'group')
+
+
+class PostImageMixin:
+    """Ссылки на варианты картинки для карточки записи."""
+
+    def srcset(self, kind):
+        return ', '.join(
+            f'{self.thumbnail.storage.url(variant[kind])} {variant["width"]}w'
+            for variant in json.loads(self.image_variants or '[]')
+        )
+
+    @property
+    def jpeg_srcset(self):
+        return self.srcset('jpeg')
+
+    @property
+    def webp_srcset(self):
+        return self.srcset('webp')
+
+
+class Post(PostImageMixin, models.Model):
     text = models.TextField('Текст', help_text='Обязательное поле')
     pub_date = models.DateTimeField(
         'Дата публикации', auto_now_add=True
@@ -35,13 +61,49 @@ class Post(models.Model):
         verbose_name='Сообщество', help_text='Не обязательное поле'
     )
     image = models.ImageField(
-        upload_to='posts/', blank=True, null=True,
+        upload_to='posts/incoming/', blank=True, null=True,
         verbose_name='Изображение', help_text='Не обязательное поле'
     )
+    thumbnail = models.ImageField(
+        'Миниатюра', upload_to='thumbs/', blank=True, editable=False
+    )
+    image_variants = models.TextField(
+        'Варианты изображения (JSON)', blank=True, default='', editable=False
+    )
+    image_width = models.PositiveIntegerField(
+        'Ширина изображения', blank=True, null=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота изображения', blank=True, null=True, editable=False
+    )
+    image_placeholder = models.TextField(
+        'Превью изображения (data URI)', blank=True, default='',
+        editable=False
+    )
+    comment_count = models.PositiveIntegerField(
+        'Количество комментариев', default=0, editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
+
+    archived = False
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name_plural = 'Записи'
+        indexes = [
+            models.Index(
+                fields=['pub_date', 'id'], name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', 'pub_date', 'id'], name='post_group_date_idx'
+            ),
+            models.Index(
+                fields=['author', 'pub_date', 'id'],
+                name='post_author_date_idx'
+            ),
+            models.Index(fields=['image'], name='post_image_idx'),
+        ]
 
     def __str__(self):
         post_date = self.pub_date
@@ -67,9 +129,264 @@ class Comment(models.Model):
     class Meta:
         ordering = ['-created']
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_idx'
+            ),
+            models.Index(
+                fields=['created', 'id'], name='comment_created_idx'
+            ),
+        ]
 
     def __str__(self):
         commentdate = self.created
         commentauthor = self.author
         commenttext = self.text[:20]
         return f'{commentauthor} - {commentdate:%d-%m-%Y} - {commenttext} ...'
+
+
+class AuthorCounter(models.Model):
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True,
+        related_name='counter', verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Количество записей', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков', default=0
+    )
+    following_count = models.PositiveIntegerField(
+        'Количество подписок', default=0
+    )
+    archived_posts_count = models.PositiveIntegerField(
+        'Записей в архиве', default=0
+    )
+
+    class Meta:
+        verbose_name_plural = 'Счетчики авторов'
+
+    def __str__(self):
+        return f'{self.user} - {self.posts_count}'
+
+
+class GroupCounter(models.Model):
+    """
+    Счетчики сообщества в отдельной таблице, как у авторов: сохранение
+    загруженного ранее сообщества их не перезапишет.
+    """
+
+    group = models.OneToOneField(
+        Group, on_delete=models.CASCADE, primary_key=True,
+        related_name='counter', verbose_name='Сообщество'
+    )
+    posts_count = models.PositiveIntegerField('Количество записей', default=0)
+    archived_posts_count = models.PositiveIntegerField(
+        'Записей в архиве', default=0
+    )
+
+    class Meta:
+        verbose_name_plural = 'Счетчики сообществ'
+
+    def __str__(self):
+        return f'{self.group} - {self.posts_count}'
+
+
+class ArchivedPost(PostImageMixin, models.Model):
+    """
+    Запись, перенесенная из posts_post командой archive_posts. Хранится
+    под прежним id; внешние ключи без ограничений в базе и без каскадов,
+    удаление выполняет posts.deletion.
+    """
+
+    id = models.IntegerField(primary_key=True)
+    text = models.TextField('Текст')
+    pub_date = models.DateTimeField('Дата публикации')
+    author = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False,
+        db_index=False, related_name='+', verbose_name='Автор'
+    )
+    group = models.ForeignKey(
+        Group, on_delete=models.DO_NOTHING, db_constraint=False,
+        db_index=False, blank=True, null=True, related_name='+',
+        verbose_name='Сообщество'
+    )
+    image = models.ImageField('Изображение', blank=True, null=True)
+    thumbnail = models.ImageField('Миниатюра', blank=True)
+    image_variants = models.TextField(
+        'Варианты изображения (JSON)', blank=True, default=''
+    )
+    image_width = models.PositiveIntegerField(
+        'Ширина изображения', blank=True, null=True
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота изображения', blank=True, null=True
+    )
+    image_placeholder = models.TextField(
+        'Превью изображения (data URI)', blank=True, default=''
+    )
+    comment_count = models.PositiveIntegerField(
+        'Количество комментариев', default=0
+    )
+
+    objects = PostQuerySet.as_manager()
+
+    archived = True
+
+    class Meta:
+        ordering = ['-pub_date']
+        verbose_name_plural = 'Архив записей'
+        indexes = [
+            models.Index(
+                fields=['pub_date', 'id'], name='archived_post_date_idx'
+            ),
+            models.Index(
+                fields=['group', 'pub_date', 'id'],
+                name='archived_post_group_idx'
+            ),
+            models.Index(
+                fields=['author', 'pub_date', 'id'],
+                name='archived_post_author_idx'
+            ),
+            models.Index(fields=['image'], name='archived_post_image_idx'),
+        ]
+
+    def __str__(self):
+        return (
+            f'{self.author} - {self.pub_date:%d-%m-%Y} - {self.text[:20]} ...'
+        )
+
+
+class ArchivedComment(models.Model):
+    id = models.IntegerField(primary_key=True)
+    post = models.ForeignKey(
+        ArchivedPost, on_delete=models.DO_NOTHING, db_constraint=False,
+        db_index=False, related_name='comments', verbose_name='Запись'
+    )
+    author = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False,
+        related_name='+', verbose_name='Автор'
+    )
+    text = models.TextField('Текст')
+    created = models.DateTimeField('Дата комментария')
+
+    class Meta:
+        ordering = ['-created']
+        verbose_name_plural = 'Архив комментариев'
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='archived_comment_post_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return (
+            f'{self.author} - {self.created:%d-%m-%Y} - {self.text[:20]} ...'
+        )
+
+
+class Follow(models.Model):
+    # Индексы по user и author покрываются составными индексами ниже.
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='follower',
+        db_index=False, verbose_name='Подписчик'
+    )
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='following',
+        db_index=False, verbose_name='Автор'
+    )
+    created = models.DateTimeField('Дата подписки', auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = 'Подписки'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='follow_unique'
+            ),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='follow_not_self'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'], name='follow_author_user_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} -> {self.author}'
+
+
+class TimelineEntry(models.Model):
+    """Запись в материализованной ленте подписок читателя."""
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='+',
+        db_index=False, verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name='+',
+        verbose_name='Запись'
+    )
+    pub_date = models.DateTimeField('Дата публикации записи')
+
+    class Meta:
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='timeline_unique'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'pub_date', 'post'],
+                name='timeline_user_date_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} - {self.post_id}'
+
+
+class Job(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    task = models.CharField('Задача', max_length=200)
+    args = models.TextField('Аргументы (JSON)', default='[]')
+    key = models.CharField(
+        'Ключ идемпотентности', max_length=200,
+        unique=True, null=True, blank=True
+    )
+    status = models.CharField(
+        'Состояние', max_length=10, choices=STATUSES, default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField(
+        'Максимум попыток', default=3
+    )
+    run_after = models.DateTimeField('Не раньше', default=timezone.now)
+    created = models.DateTimeField('Поставлена', auto_now_add=True)
+    started = models.DateTimeField('Начата', null=True, blank=True)
+    finished = models.DateTimeField('Завершена', null=True, blank=True)
+    error = models.TextField('Последняя ошибка', blank=True)
+
+    class Meta:
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(
+                fields=['status', 'run_after'], name='job_status_run_after_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.task} #{self.pk} - {self.status}'
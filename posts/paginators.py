@@ -0,0 +1,333 @@
+from math import ceil
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes, force_text
+from django.utils.functional import cached_property
+from django.utils.http import (urlencode, urlsafe_base64_decode,
+                               urlsafe_base64_encode)
+
+from posts import constants
+
+from .archive import archive_cutoff
+from .counters import estimated_count
+
+
+def encode_cursor(key, pk):
+    value = f'{key.isoformat()}|{pk}'
+    return urlsafe_base64_encode(force_bytes(value))
+
+
+def decode_cursor(token):
+    try:
+        key, pk = force_text(urlsafe_base64_decode(token)).split('|')
+        key, pk = parse_datetime(key), int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+    if key is None:
+        return None
+    return key, pk
+
+
+class CursorPage(Page):
+    """Страница, полученная по курсору (key, id) без COUNT и OFFSET."""
+
+    def __init__(self, object_list, paginator, has_previous, has_next):
+        super().__init__(object_list, None, paginator)
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self.object_list)} items>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_previous or self._has_next
+
+    def next_page_number(self):
+        return self.paginator.cursor(self.object_list[-1])
+
+    def previous_page_number(self):
+        return self.paginator.cursor(self.object_list[0])
+
+    def next_page_query(self):
+        return urlencode(
+            {**self.paginator.query_params, 'after': self.next_page_number()}
+        )
+
+    def previous_page_query(self):
+        return urlencode({
+            **self.paginator.query_params,
+            'before': self.previous_page_number(),
+        })
+
+    def start_index(self):
+        return None
+
+    def end_index(self):
+        return None
+
+
+class CursorPaginator(Paginator):
+    """
+    Keyset-пагинация по паре (key, id) в порядке убывания.
+
+    В отличие от Paginator не считает COUNT(*) и не использует OFFSET,
+    поэтому любая страница выбирается за одно обращение к индексу.
+    Номеров страниц нет: соседние страницы адресуются непрозрачными
+    токенами ?after= и ?before=.
+    """
+
+    page_range = ()
+
+    def __init__(self, object_list, per_page, key='pub_date',
+                 query_params=None):
+        super().__init__(object_list, per_page)
+        self.key = key
+        self.query_params = query_params or {}
+
+    def cursor(self, obj):
+        return encode_cursor(getattr(obj, self.key), obj.pk)
+
+    def decode(self, token):
+        return decode_cursor(token)
+
+    def get_page(self, after=None, before=None):
+        after = self.decode(after) if after else None
+        before = self.decode(before) if before else None
+        if after is not None:
+            return self._page_after(*after)
+        if before is not None:
+            return self._page_before(*before)
+        return self._page_after(None, None)
+
+    def page(self, number):
+        return self.get_page()
+
+    def queryset_after(self, key=None, pk=None):
+        queryset = self.object_list.order_by(f'-{self.key}', '-pk')
+        if key is not None:
+            queryset = queryset.filter(
+                Q(**{f'{self.key}__lt': key})
+                | Q(**{self.key: key, 'pk__lt': pk})
+            )
+        return queryset[:self.per_page + 1]
+
+    def queryset_before(self, key, pk):
+        queryset = self.object_list.order_by(self.key, 'pk').filter(
+            Q(**{f'{self.key}__gt': key})
+            | Q(**{self.key: key, 'pk__gt': pk})
+        )
+        return queryset[:self.per_page + 1]
+
+    def _page_after(self, key, pk):
+        rows = list(self.queryset_after(key, pk))
+        if key is not None and not rows:
+            return self._page_before(key, pk, has_next=False)
+        has_next = len(rows) > self.per_page
+        return CursorPage(
+            rows[:self.per_page], self,
+            has_previous=key is not None, has_next=has_next
+        )
+
+    def _page_before(self, key, pk, has_next=True):
+        rows = list(self.queryset_before(key, pk))
+        has_previous = len(rows) > self.per_page
+        if not has_previous and has_next:
+            return self._page_after(None, None)
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return CursorPage(
+            rows, self, has_previous=has_previous, has_next=has_next
+        )
+
+
+class ArchiveCursorPaginator(CursorPaginator):
+    """
+    Лента, которая за последней горячей записью продолжается архивом.
+
+    Архив читается, только когда горячих записей на странице не хватило
+    или курсор указывает старше границы архивации: все архивные записи
+    старше нее, поэтому более новые страницы архив не затрагивают.
+    """
+
+    def __init__(self, object_list, per_page, archive, cutoff,
+                 key='pub_date', query_params=None):
+        super().__init__(object_list, per_page, key, query_params)
+        self.archive = archive
+        self.cutoff = cutoff
+
+    def archive_paginator(self, per_page):
+        return CursorPaginator(self.archive, per_page, key=self.key)
+
+    def queryset_after(self, key=None, pk=None):
+        rows = list(super().queryset_after(key, pk))
+        if len(rows) > self.per_page:
+            return rows
+        if rows:
+            key, pk = getattr(rows[-1], self.key), rows[-1].pk
+        archive = self.archive_paginator(self.per_page - len(rows))
+        return rows + list(archive.queryset_after(key, pk))
+
+    def queryset_before(self, key, pk):
+        if key >= self.cutoff:
+            return super().queryset_before(key, pk)
+        rows = list(
+            self.archive_paginator(self.per_page).queryset_before(key, pk)
+        )
+        if len(rows) > self.per_page:
+            return rows
+        if rows:
+            key, pk = getattr(rows[-1], self.key), rows[-1].pk
+        hot = CursorPaginator(
+            self.object_list, self.per_page - len(rows), key=self.key
+        )
+        return rows + list(hot.queryset_before(key, pk))
+
+
+class WindowedPage(Page):
+    """Нумерованная страница с окном ссылок вокруг текущей."""
+
+    def window(self):
+        return self.paginator.window(self.number)
+
+    def has_next(self):
+        return super().has_next() or (
+            (self.paginator.truncated or self.paginator.continues)
+            and bool(self.object_list)
+        )
+
+    def next_page_query(self):
+        # За последней нумерованной страницей лента продолжается по
+        # курсору, чтобы не платить за большой OFFSET.
+        if super().has_next():
+            return urlencode({'page': self.next_page_number()})
+        return urlencode(
+            {'after': self.paginator.cursor(self[-1])}
+        )
+
+    def previous_page_query(self):
+        return urlencode({'page': self.previous_page_number()})
+
+
+class WindowedPaginator(Paginator):
+    """
+    Нумерованные страницы без полного page_range.
+
+    Шаблон получает только окно из window страниц по обе стороны от
+    текущей плюс первую и последнюю. Номера ограничены max_pages, дальше
+    лента листается курсором. Число записей можно передать готовым
+    (из счетчика) или получить через estimated_count(). С continues
+    за последней страницей лента продолжается курсором в архив.
+    """
+
+    def __init__(self, object_list, per_page, count=None, count_key=None,
+                 key='pub_date', window=constants.page_window,
+                 max_pages=constants.max_page_number, continues=False):
+        super().__init__(
+            object_list.order_by(f'-{key}', '-pk'), per_page
+        )
+        self._count = count
+        self.count_key = count_key
+        self.key = key
+        self.window_size = window
+        self.max_pages = max_pages
+        self.continues = continues
+
+    @cached_property
+    def count(self):
+        if self._count is not None:
+            return self._count
+        return estimated_count(self.object_list, self.count_key)
+
+    @cached_property
+    def total_pages(self):
+        if self.count == 0 and not self.allow_empty_first_page:
+            return 0
+        hits = max(1, self.count - self.orphans)
+        return ceil(hits / self.per_page)
+
+    @cached_property
+    def num_pages(self):
+        return min(self.total_pages, self.max_pages)
+
+    @property
+    def truncated(self):
+        return self.total_pages > self.max_pages
+
+    @property
+    def page_range(self):
+        return range(1, self.num_pages + 1)
+
+    def window(self, number):
+        last = self.num_pages
+        numbers = sorted({1, last, *range(
+            max(number - self.window_size, 1),
+            min(number + self.window_size, last) + 1,
+        )})
+        window = []
+        for previous, current in zip([0, *numbers], numbers):
+            if current - previous > 1:
+                window.append(None)
+            window.append(current)
+        return window
+
+    def cursor(self, obj):
+        return encode_cursor(getattr(obj, self.key), obj.pk)
+
+    def _get_page(self, *args, **kwargs):
+        return WindowedPage(*args, **kwargs)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator для changelist админки: на больших таблицах без фильтров
+    число строк берется из статистики SQLite вместо COUNT(*).
+    """
+
+    @cached_property
+    def count(self):
+        return estimated_count(self.object_list)
+
+
+def get_feed_page(request, queryset, per_page, count=None, count_key=None,
+                  archive=None, archived=0):
+    """
+    Первая и нумерованные (?page=) страницы ленты — WindowedPaginator,
+    переходы по курсору (?after=, ?before=) — CursorPaginator.
+
+    archive — такая же лента по архивным записям, archived — их число;
+    в архив лента переходит только по курсору за последней горячей
+    записью.
+    """
+    if 'after' in request.GET or 'before' in request.GET:
+        paginator = cursor_paginator(queryset, per_page, archive, archived)
+        page = paginator.get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+    else:
+        paginator = WindowedPaginator(
+            queryset, per_page, count=count, count_key=count_key,
+            continues=bool(archived),
+        )
+        page = paginator.get_page(request.GET.get('page'))
+        if archived and not page.object_list:
+            # Горячих записей не осталось, лента начинается с архива.
+            paginator = cursor_paginator(queryset, per_page, archive, archived)
+            page = paginator.get_page()
+    return paginator, page
+
+
+def cursor_paginator(queryset, per_page, archive=None, archived=0):
+    if archive is None or not archived:
+        return CursorPaginator(queryset, per_page)
+    return ArchiveCursorPaginator(
+        queryset, per_page, archive, archive_cutoff()
+    )
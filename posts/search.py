@@ -0,0 +1,119 @@
+import re
+
+from django.db import connection, transaction
+from django.utils.encoding import force_bytes, force_text
+from django.utils.html import escape
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .models import Post
+from .paginators import CursorPaginator
+
+MARK_START, MARK_END = '\x02', '\x03'
+
+SEARCH_SQL = '''
+    SELECT rowid, rank, snippet(posts_post_fts, 0, %s, %s, '…', 16)
+    FROM posts_post_fts
+    WHERE posts_post_fts MATCH %s {where}
+    ORDER BY rank {order}, rowid {order}
+    LIMIT %s
+'''
+
+
+def match_expression(query):
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def matching_ids_sql(query):
+    return (
+        'SELECT rowid FROM posts_post_fts WHERE posts_post_fts MATCH %s',
+        [match_expression(query)],
+    )
+
+
+def highlight(snippet):
+    return escape(snippet).replace(MARK_START, '<mark>').replace(
+        MARK_END, '</mark>'
+    )
+
+
+class SearchPaginator(CursorPaginator):
+    """Постраничная выдача FTS5 по курсору (rank, rowid)."""
+
+    def __init__(self, query, per_page):
+        super().__init__(
+            Post.objects.feed(), per_page, key='rank',
+            query_params={'q': query},
+        )
+        self.match = match_expression(query)
+
+    def cursor(self, obj):
+        return urlsafe_base64_encode(force_bytes(f'{obj.rank!r}|{obj.pk}'))
+
+    def decode(self, token):
+        try:
+            rank, pk = force_text(urlsafe_base64_decode(token)).split('|')
+            return float(rank), int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            return None
+
+    def search(self, where, params, order):
+        if not self.match:
+            return []
+        sql = SEARCH_SQL.format(where=where, order=order)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [
+                MARK_START, MARK_END, self.match, *params, self.per_page + 1
+            ])
+            rows = cursor.fetchall()
+        posts = self.object_list.in_bulk([pk for pk, _, _ in rows])
+        results = []
+        for pk, rank, snippet in rows:
+            if pk in posts:
+                post = posts[pk]
+                post.rank = rank
+                post.snippet = highlight(snippet)
+                results.append(post)
+        return results
+
+    def queryset_after(self, key=None, pk=None):
+        if key is None:
+            return self.search('', [], 'ASC')
+        return self.search(
+            'AND (rank > %s OR (rank = %s AND rowid > %s))',
+            [key, key, pk], 'ASC'
+        )
+
+    def queryset_before(self, key, pk):
+        return self.search(
+            'AND (rank < %s OR (rank = %s AND rowid < %s))',
+            [key, key, pk], 'DESC'
+        )
+
+
+def rebuild_search_index(batch_size, progress=None):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO posts_post_fts (posts_post_fts) VALUES ('delete-all')"
+        )
+    last_pk = 0
+    indexed = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT MAX(id) FROM ('
+                'SELECT id FROM posts_post WHERE id > %s ORDER BY id LIMIT %s)',
+                [last_pk, batch_size],
+            )
+            upper_pk = cursor.fetchone()[0]
+            if upper_pk is None:
+                return indexed
+            cursor.execute(
+                'INSERT INTO posts_post_fts (rowid, text) '
+                'SELECT id, text FROM posts_post WHERE id > %s AND id <= %s',
+                [last_pk, upper_pk],
+            )
+            indexed += cursor.rowcount
+            last_pk = upper_pk
+        if progress is not None:
+            progress(indexed)
@@ -0,0 +1,141 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .cache import (SITE_SCOPE_KEY, bump_version, group_version_key,
+                    page_scope_key, post_version_key, purge_post_pages)
+from .counters import (change_author_counter, change_comment_count,
+                       change_group_counter)
+from .images import is_incoming, schedule_image_processing
+from .models import Comment, Follow, Group, Post
+from .thumbnails import needs_thumbnail, schedule_thumbnail, thumbnail_name
+from .timelines import schedule_fan_out, schedule_followers_backfill
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    if created:
+        change_author_counter(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    change_author_counter(instance.author_id, 'posts_count', -1)
+    if instance.group_id is not None:
+        change_group_counter(instance.group_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_created_post(sender, instance, created, **kwargs):
+    if created:
+        schedule_fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        change_author_counter(instance.author_id, 'followers_count', 1)
+        change_author_counter(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    change_author_counter(instance.author_id, 'followers_count', -1)
+    change_author_counter(instance.user_id, 'following_count', -1)
+    schedule_followers_backfill(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def purge_follow_profiles(sender, instance, **kwargs):
+    # Счетчики подписок и кнопка подписки выводятся на страницах
+    # профилей и записей обоих пользователей.
+    for user in (instance.user, instance.author):
+        bump_version(page_scope_key('profile', username=user.username))
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        change_comment_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    change_comment_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_card(sender, instance, **kwargs):
+    bump_version(post_version_key(instance.pk))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_commented_post_card(sender, instance, **kwargs):
+    bump_version(post_version_key(instance.post_id))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_post_cards(sender, instance, **kwargs):
+    bump_version(group_version_key(instance.pk))
+    # Название сообщества выводится в карточках на всех лентах.
+    bump_version(SITE_SCOPE_KEY)
+
+
+@receiver(post_init, sender=Post)
+def remember_post_group(sender, instance, **kwargs):
+    # Через __dict__, чтобы не загружать отложенное поле.
+    instance._loaded_group_id = instance.__dict__.get('group_id')
+
+
+@receiver(post_save, sender=Post)
+def count_group_posts(sender, instance, created, **kwargs):
+    if not created and 'group_id' not in instance.__dict__:
+        # Сообщество не загружалось и не менялось.
+        return
+    old_group_id = None if created else instance._loaded_group_id
+    if old_group_id == instance.group_id:
+        return
+    if old_group_id is not None:
+        change_group_counter(old_group_id, 'posts_count', -1)
+    if instance.group_id is not None:
+        change_group_counter(instance.group_id, 'posts_count', 1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def purge_pages_of_post(sender, instance, **kwargs):
+    old_group_id = instance._loaded_group_id
+    groups = []
+    if old_group_id is not None and old_group_id != instance.group_id:
+        groups = Group.objects.filter(pk=old_group_id)
+    purge_post_pages(instance, *groups)
+    instance._loaded_group_id = instance.group_id
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def purge_pages_of_commented_post(sender, instance, **kwargs):
+    post = Post.objects.feed().filter(pk=instance.post_id).first()
+    if post is not None:
+        purge_post_pages(post)
+
+
+@receiver(post_save, sender=Post)
+def refresh_thumbnail(sender, instance, **kwargs):
+    incoming = bool(instance.image) and is_incoming(instance.image.name)
+    expected = thumbnail_name(instance.image.name) if instance.image else ''
+    if (instance.thumbnail and instance.thumbnail.name != expected) or (
+        incoming and instance.image_placeholder
+    ):
+        # Миниатюра и превью относятся к прежней картинке.
+        Post.objects.filter(pk=instance.pk).update(
+            thumbnail='', image_variants='', image_width=None,
+            image_height=None, image_placeholder='',
+        )
+    if incoming:
+        schedule_image_processing(instance.pk, instance.image.name)
+    elif needs_thumbnail(instance):
+        schedule_thumbnail(instance.pk, instance.image.name)
@@ -0,0 +1,22 @@
+from django import template
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts import constants
+from posts.cache import count_event, post_card_key
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_card(post):
+    key = post_card_key(post)
+    html = cache.get(key)
+    if html is None:
+        count_event('post_card:misses')
+        html = render_to_string('posts/include/post_card.html', {'post': post})
+        cache.set(key, html, constants.post_card_cache_seconds)
+    else:
+        count_event('post_card:hits')
+    return mark_safe(html)
@@ -0,0 +1,93 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class AdminChangelistQueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        # Сессия и пользователь, оценка и подсчет строк, сама страница;
+        # у записей и комментариев — еще две выборки для date_hierarchy,
+        # у записей — список сообществ для фильтра.
+        cls.changelists = {
+            'admin:posts_post_changelist': 8,
+            'admin:posts_comment_changelist': 7,
+            'admin:posts_group_changelist': 5,
+        }
+
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+
+    def add_rows(self, count):
+        first = Post.objects.count()
+        for n in range(first, first + count):
+            author = User.objects.create(username=f'author{n}')
+            group = Group.objects.create(
+                title=f'Сообщество {n}', slug=f'group-{n}'
+            )
+            post = Post.objects.create(
+                text=f'Запись {n}', author=author, group=group
+            )
+            Comment.objects.create(
+                post=post, author=author, text=f'Комментарий {n}'
+            )
+
+
+    def test_changelist_query_budget_does_not_depend_on_rows(self):
+        for rows in (1, 5):
+            self.add_rows(rows - Post.objects.count())
+            for name, budget in self.changelists.items():
+                with self.subTest(changelist=name, rows=rows):
+                    with CaptureQueriesContext(connection) as queries:
+                        response = self.client.get(reverse(name))
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(len(queries), budget)
+
+
+    def test_comment_search_by_username_prefix(self):
+        self.add_rows(2)
+        response = self.client.get(
+            reverse('admin:posts_comment_changelist'), {'q': 'author1'}
+        )
+        self.assertEqual(
+            [comment.text for comment in response.context['cl'].result_list],
+            ['Комментарий 1']
+        )
+
+
+    def test_post_search_without_words_finds_nothing(self):
+        self.add_rows(1)
+        for query in ('!!!', '"'):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    reverse('admin:posts_post_changelist'), {'q': query}
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(list(response.context['cl'].result_list), [])
+
+
+    @mock.patch('posts.counters.table_row_estimate', return_value=10 ** 7)
+    def test_unfiltered_changelist_uses_estimated_count(self, estimate):
+        self.add_rows(1)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('admin:posts_post_changelist')
+            )
+        self.assertEqual(response.context['cl'].result_count, 10 ** 7)
+        self.assertFalse(
+            [query for query in queries if 'COUNT(*)' in query['sql']]
+        )
@@ -0,0 +1,200 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import constants
+
+from ..archive import PostArchiver, archive_cutoff
+from ..counters import reconcile_author_counters
+from ..deletion import BulkDeleter
+from ..models import (ArchivedComment, ArchivedPost, AuthorCounter, Comment,
+                      Group, GroupCounter, Post, TimelineEntry)
+from ..search import SearchPaginator
+
+User = get_user_model()
+
+
+class PostArchiverTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='author')
+        self.reader = User.objects.create(username='reader')
+        self.group = Group.objects.create(
+            title='Тестовое сообщество', slug='test-group'
+        )
+        old = timezone.now() - timedelta(days=365)
+        for n in range(constants.posts_per_page + 3):
+            post = Post.objects.create(
+                text=f'Старая запись {n}', author=self.author,
+                group=self.group,
+            )
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=old + timedelta(minutes=n)
+            )
+            Comment.objects.create(
+                post=post, author=self.reader, text=f'Комментарий {n}'
+            )
+            TimelineEntry.objects.create(
+                user=self.reader, post=post, pub_date=old
+            )
+        self.hot_posts = [
+            Post.objects.create(
+                text=f'Новая запись {n}', author=self.author,
+                group=self.group,
+            )
+            for n in range(3)
+        ]
+        self.old_count = constants.posts_per_page + 3
+        self.stages = []
+
+
+    def progress(self, stage, count):
+        self.stages.append((stage, count))
+
+
+    def archive(self):
+        return PostArchiver(4, progress=self.progress).archive(
+            archive_cutoff()
+        )
+
+
+    def walk(self, url):
+        """Тексты всех записей ленты, пройденной по ссылкам «дальше»."""
+        texts = []
+        query = ''
+        while True:
+            page = self.client.get(f'{url}?{query}').context['page']
+            texts += [post.text for post in page]
+            if not page.has_next():
+                return texts
+            query = page.next_page_query()
+
+
+    def test_old_posts_and_comments_move_to_archive(self):
+        self.assertEqual(self.archive(), self.old_count)
+
+        self.assertEqual(set(Post.objects.all()), set(self.hot_posts))
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(ArchivedPost.objects.count(), self.old_count)
+        self.assertEqual(ArchivedComment.objects.count(), self.old_count)
+        archived = ArchivedPost.objects.get(text='Старая запись 0')
+        self.assertEqual(archived.comment_count, 1)
+        self.assertEqual(
+            archived.comments.get().text, 'Комментарий 0'
+        )
+        counter = AuthorCounter.objects.get(user=self.author)
+        self.assertEqual(counter.posts_count, self.old_count + 3)
+        self.assertEqual(counter.archived_posts_count, self.old_count)
+        counter = GroupCounter.objects.get(group=self.group)
+        self.assertEqual(counter.posts_count, self.old_count + 3)
+        self.assertEqual(counter.archived_posts_count, self.old_count)
+        self.assertIn(('posts', self.old_count), self.stages)
+        # Архивные записи не попадают в полнотекстовый поиск.
+        self.assertEqual(
+            len(SearchPaginator('Старая', 100).get_page()), 0
+        )
+        self.assertEqual(self.archive(), 0)
+
+
+    def test_conflicting_archive_rows_keep_hot_posts(self):
+        post = Post.objects.filter(text='Старая запись 0').get()
+        ArchivedPost.objects.create(
+            id=post.pk, text='Другая запись', author=self.reader,
+            pub_date=post.pub_date,
+        )
+        with self.assertRaises(IntegrityError):
+            self.archive()
+        self.assertTrue(Post.objects.filter(pk=post.pk).exists())
+        self.assertEqual(
+            ArchivedPost.objects.get(pk=post.pk).text, 'Другая запись'
+        )
+
+
+    def test_feeds_fall_through_to_archive(self):
+        self.archive()
+        expected = [f'Новая запись {n}' for n in range(2, -1, -1)] + [
+            f'Старая запись {n}' for n in range(self.old_count - 1, -1, -1)
+        ]
+        for url in (
+            reverse('profile', kwargs={'username': self.author.username}),
+            reverse('group_posts', kwargs={'slug': self.group.slug}),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.walk(url), expected)
+
+
+    def test_cursor_returns_from_archive_to_hot_posts(self):
+        self.archive()
+        url = reverse('profile', kwargs={'username': self.author.username})
+        first = self.client.get(url).context['page']
+        second = self.client.get(
+            f'{url}?{first.next_page_query()}'
+        ).context['page']
+        back = self.client.get(
+            f'{url}?{second.previous_page_query()}'
+        ).context['page']
+        self.assertEqual(back[0].text, first[0].text)
+        self.assertFalse(back.has_previous())
+        self.assertEqual(back[len(first)].text, second[0].text)
+
+
+    def test_profile_starts_from_archive_without_hot_posts(self):
+        hot_ids = [post.pk for post in self.hot_posts]
+        Post.objects.filter(pk__in=hot_ids).update(
+            pub_date=timezone.now() - timedelta(days=300)
+        )
+        self.archive()
+        response = self.client.get(
+            reverse('profile', kwargs={'username': self.author.username})
+        )
+        self.assertEqual(
+            len(response.context['page']), constants.posts_per_page
+        )
+
+
+    def test_archived_post_is_readable_but_read_only(self):
+        self.archive()
+        post = ArchivedPost.objects.get(text='Старая запись 0')
+        kwargs = {'username': self.author.username, 'post_id': post.pk}
+        response = self.client.get(reverse('post', kwargs=kwargs))
+        self.assertContains(response, 'Старая запись 0')
+        client = Client()
+        client.force_login(self.author)
+        response = client.get(reverse('add_comment', kwargs=kwargs))
+        self.assertContains(response, 'Комментарий 0')
+        client.post(reverse('add_comment', kwargs=kwargs), {'text': 'Новый'})
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(ArchivedComment.objects.filter(
+            text='Новый'
+        ).count(), 0)
+        response = client.get(reverse('post_edit', kwargs=kwargs))
+        self.assertEqual(response.status_code, 404)
+
+
+    def test_archived_posts_are_deleted_with_user(self):
+        self.archive()
+        BulkDeleter(4).delete_user(self.reader)
+        self.assertFalse(ArchivedComment.objects.exists())
+        self.assertFalse(ArchivedPost.objects.filter(comment_count=1).exists())
+        BulkDeleter(4).delete_user(self.author)
+        self.assertFalse(ArchivedPost.objects.exists())
+        counter = GroupCounter.objects.get(group=self.group)
+        self.assertEqual(counter.posts_count, 0)
+        self.assertEqual(counter.archived_posts_count, 0)
+
+
+    def test_reconcile_counts_archived_posts(self):
+        self.archive()
+        AuthorCounter.objects.filter(user=self.author).update(
+            posts_count=0, archived_posts_count=0
+        )
+        reconcile_author_counters(self.author.pk, self.author.pk)
+        counter = AuthorCounter.objects.get(user=self.author)
+        self.assertEqual(counter.posts_count, self.old_count + 3)
+        self.assertEqual(counter.archived_posts_count, self.old_count)
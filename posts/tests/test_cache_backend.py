@@ -0,0 +1,78 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from yatube.cache import SQLiteCache
+
+
+def increment_many(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.location = os.path.join(self.dirname, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {})
+
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname, ignore_errors=True)
+
+
+    def test_set_get_many(self):
+        self.cache.set_many({'a': 1, 'b': {'text': 'Запись'}})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c']),
+            {'a': 1, 'b': {'text': 'Запись'}},
+        )
+        self.cache.delete_many(['a'])
+        self.assertIsNone(self.cache.get('a'))
+
+
+    def test_timeout_and_add(self):
+        self.cache.set('key', 'value', timeout=0.05)
+        self.assertFalse(self.cache.add('key', 'other'))
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'other'))
+        self.assertEqual(self.cache.get('key'), 'other')
+
+
+    def test_incr_is_shared_between_processes(self):
+        self.cache.set('counter', 0)
+        workers = [
+            multiprocessing.Process(
+                target=increment_many, args=(self.location, 50)
+            )
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+        self.assertEqual(self.cache.decr('counter', 10), 190)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+
+    def test_least_recently_used_entries_are_culled(self):
+        cache = SQLiteCache(self.location, {'OPTIONS': {
+            'MAX_ENTRIES': 4, 'CULL_FREQUENCY': 4,
+            'CULL_INTERVAL': 1, 'TOUCH_INTERVAL': 0,
+        }})
+        for n in range(4):
+            cache.set(f'key{n}', n)
+            time.sleep(0.01)
+        cache.get('key0')
+        cache.set('key4', 4)
+        self.assertIsNone(cache.get('key1'))
+        self.assertEqual(cache.get('key0'), 0)
+        self.assertEqual(cache.get('key4'), 4)
@@ -0,0 +1,349 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from posts import constants
+
+from ..archive import PostArchiver, archive_cutoff
+from ..models import (ArchivedComment, ArchivedPost, AuthorCounter, Comment,
+                      Group, GroupCounter, Post)
+from ..thumbnails import thumbnail_name
+
+User = get_user_model()
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+class CheckQueryPlansCommandTests(TestCase):
+    def test_feed_queries_use_indexes(self):
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertNotIn('TEMP B-TREE', out.getvalue())
+
+
+class ReconcileCountersCommandTests(TestCase):
+    def test_drift_is_repaired(self):
+        user = User.objects.create(username='test_user')
+        group = Group.objects.create(title='Тестовое сообщество', slug='test')
+        post = Post.objects.create(
+            text='Тестовый пост', author=user, group=group
+        )
+        Comment.objects.create(post=post, author=user, text='Комментарий')
+        Post.objects.update(comment_count=7)
+        AuthorCounter.objects.all().delete()
+        GroupCounter.objects.all().delete()
+
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(AuthorCounter.objects.get(user=user).posts_count, 1)
+        self.assertEqual(GroupCounter.objects.get(group=group).posts_count, 1)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class GenerateThumbnailsCommandTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+
+    def create_post(self, user):
+        post = Post.objects.create(text='Тестовый пост', author=user)
+        name = default_storage.save(
+            'posts/small.gif', ContentFile(constants.small_gif)
+        )
+        Post.objects.filter(pk=post.pk).update(image=name)
+        post.refresh_from_db()
+        return post
+
+
+    def test_missing_thumbnails_are_created(self):
+        user = User.objects.create(username='test_user')
+        post = self.create_post(user)
+        self.assertFalse(post.thumbnail)
+
+        call_command('generate_thumbnails', workers=1, stdout=StringIO())
+
+        post.refresh_from_db()
+        self.assertEqual(post.thumbnail.name, thumbnail_name(post.image.name))
+        self.assertTrue(os.path.exists(post.thumbnail.path))
+        response = self.client.get(
+            reverse('profile', kwargs={'username': user.username})
+        )
+        self.assertContains(response, post.thumbnail.url)
+
+
+    def test_width_variants_are_rendered_and_listed(self):
+        user = User.objects.create(username='test_user')
+        post = self.create_post(user)
+
+        call_command('generate_thumbnails', workers=1, stdout=StringIO())
+
+        post.refresh_from_db()
+        variants = json.loads(post.image_variants)
+        with Image.open(post.image.path) as image:
+            width, height = image.size
+        self.assertEqual(
+            [variant['width'] for variant in variants],
+            list(constants.image_variant_widths)
+        )
+        for variant in variants:
+            for kind in ('jpeg', 'webp'):
+                with self.subTest(width=variant['width'], kind=kind):
+                    path = default_storage.path(variant[kind])
+                    with Image.open(path) as image:
+                        self.assertEqual(image.size, (
+                            variant['width'],
+                            round(variant['width'] * height / width)
+                        ))
+        response = self.client.get(
+            reverse('profile', kwargs={'username': user.username})
+        )
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, f'srcset="{post.webp_srcset}"')
+        self.assertContains(response, f'srcset="{post.jpeg_srcset}"')
+
+
+    def test_incoming_uploads_are_skipped(self):
+        user = User.objects.create(username='test_user')
+        post = Post.objects.create(
+            text='Тестовый пост',
+            author=user,
+            image=SimpleUploadedFile('small.gif', constants.small_gif),
+        )
+
+        call_command('generate_thumbnails', workers=1, stdout=StringIO())
+
+        post.refresh_from_db()
+        self.assertFalse(post.thumbnail)
+        self.assertFalse(
+            default_storage.exists(thumbnail_name(post.image.name))
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BackfillImageMetadataCommandTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+
+    def test_existing_images_get_dimensions_and_placeholder(self):
+        user = User.objects.create(username='test_user')
+        post = Post.objects.create(text='Тестовый пост', author=user)
+        name = default_storage.save(
+            'posts/legacy.gif', ContentFile(constants.small_gif)
+        )
+        Post.objects.filter(pk=post.pk).update(image=name)
+
+        call_command('backfill_image_metadata', workers=1, stdout=StringIO())
+
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertTrue(post.image_placeholder.startswith('data:image/'))
+
+        Post.objects.filter(pk=post.pk).update(thumbnail=name)
+        response = self.client.get(
+            reverse('profile', kwargs={'username': user.username})
+        )
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, 'width="2" height="1"')
+        self.assertContains(response, post.image_placeholder)
+
+
+class RebuildSearchIndexCommandTests(TestCase):
+    def test_existing_posts_are_indexed(self):
+        user = User.objects.create(username='test_user')
+        for n in range(5):
+            Post.objects.create(text=f'Запись {n}', author=user)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO posts_post_fts (posts_post_fts) "
+                "VALUES ('delete-all')"
+            )
+
+        call_command('rebuild_search_index', batch_size=2, stdout=StringIO())
+
+        response = self.client.get(reverse('search'), {'q': 'запись'})
+        self.assertEqual(len(response.context['page']), 5)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class GenerateDatasetCommandTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+
+    def test_dataset_is_reproducible(self):
+        options = dict(users=3, groups=2, posts=20, comments=30, images=2,
+                       image_ratio=0.5, batch_size=7, stdout=StringIO())
+        call_command('generate_dataset', seed=5, **options)
+        first = list(Post.objects.order_by('pk').values_list(
+            'text', 'pub_date', 'comment_count'
+        ))
+        Post.objects.all().delete()
+        call_command('generate_dataset', seed=5, **options)
+        second = list(Post.objects.order_by('pk').values_list(
+            'text', 'pub_date', 'comment_count'
+        ))
+
+        self.assertEqual(len(first), 20)
+        self.assertEqual(first, second)
+        self.assertEqual(Comment.objects.count(), 30)
+        self.assertEqual(
+            sum(counter.posts_count
+                for counter in AuthorCounter.objects.all()), 20
+        )
+
+
+class JsonlTransferCommandTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'dump.jsonl')
+
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+    def test_export_import_round_trip(self):
+        user = User.objects.create(username='test_user')
+        group = Group.objects.create(
+            title='Тестовое сообщество', slug='test-group', description='-'
+        )
+        post = Post.objects.create(text='Тестовый пост', author=user,
+                                   group=group)
+        Comment.objects.create(post=post, author=user, text='Комментарий')
+        call_command('export_jsonl', self.path, chunk_size=1,
+                     stderr=StringIO())
+        Post.objects.all().delete()
+        user.delete()
+
+        call_command('import_jsonl', self.path, batch_size=1,
+                     stdout=StringIO())
+
+        imported = Post.objects.get()
+        self.assertEqual(imported.text, post.text)
+        self.assertEqual(imported.pub_date, post.pub_date)
+        self.assertEqual(imported.group, group)
+        self.assertEqual(imported.author.username, 'test_user')
+        self.assertEqual(imported.comment_count, 1)
+        self.assertEqual(imported.comments.get().text, 'Комментарий')
+        response = self.client.get(reverse('search'), {'q': 'тестовый'})
+        self.assertEqual(len(response.context['page']), 1)
+
+
+    def test_archived_posts_survive_round_trip(self):
+        user = User.objects.create(username='test_user')
+        group = Group.objects.create(
+            title='Тестовое сообщество', slug='test-group', description='-'
+        )
+        old = Post.objects.create(text='Старая запись', author=user,
+                                  group=group)
+        Post.objects.filter(pk=old.pk).update(
+            pub_date=timezone.now() - timedelta(days=365)
+        )
+        Comment.objects.create(post=old, author=user, text='Старый')
+        hot = Post.objects.create(text='Новая запись', author=user)
+        Comment.objects.create(post=hot, author=user, text='Новый')
+        PostArchiver(progress=lambda stage, count: None).archive(
+            archive_cutoff()
+        )
+        call_command('export_jsonl', self.path, chunk_size=1,
+                     stderr=StringIO())
+        ArchivedComment.objects.all().delete()
+        ArchivedPost.objects.all().delete()
+        Post.objects.all().delete()
+        user.delete()
+
+        call_command('import_jsonl', self.path, batch_size=1,
+                     stdout=StringIO())
+
+        archived = ArchivedPost.objects.get()
+        self.assertEqual(archived.text, 'Старая запись')
+        self.assertEqual(archived.group, group)
+        self.assertEqual(archived.comment_count, 1)
+        self.assertEqual(archived.comments.get().text, 'Старый')
+        self.assertEqual(Post.objects.get().comments.get().text, 'Новый')
+        counter = AuthorCounter.objects.get(user__username='test_user')
+        self.assertEqual(counter.posts_count, 2)
+        self.assertEqual(counter.archived_posts_count, 1)
+
+
+    def test_invalid_lines_are_skipped(self):
+        with open(self.path, 'w') as jsonl:
+            jsonl.write(
+                '{"model": "post", "id": 1, "text": "Запись", '
+                '"pub_date": "2020-01-01T00:00:00+00:00", "author": "a"}\n'
+                '{"model": "post", "id": 2, "text": "Без даты", '
+                '"pub_date": "вчера", "author": "a"}\n'
+                'not json\n'
+            )
+        errors = StringIO()
+        call_command('import_jsonl', self.path, stdout=StringIO(),
+                     stderr=errors)
+
+        self.assertEqual(Post.objects.get().text, 'Запись')
+        self.assertIn('Строка 2', errors.getvalue())
+        self.assertIn('Строка 3', errors.getvalue())
+
+
+    def test_comments_of_missing_posts_are_skipped(self):
+        with open(self.path, 'w') as jsonl:
+            jsonl.write(
+                '{"model": "post", "id": 1, "text": "Запись", '
+                '"pub_date": "2020-01-01T00:00:00+00:00", "author": "a"}\n'
+                '{"model": "post", "id": 2, "text": "Без даты", '
+                '"pub_date": "вчера", "author": "a"}\n'
+                '{"model": "comment", "id": 1, "post": 1, "text": "Есть", '
+                '"created": "2020-01-01T00:00:00+00:00", "author": "a"}\n'
+                '{"model": "comment", "id": 2, "post": 2, "text": "Нет", '
+                '"created": "2020-01-01T00:00:00+00:00", "author": "a"}\n'
+                '{"model": "comment", "id": 3, "post": 7, "text": "Нет", '
+                '"created": "2020-01-01T00:00:00+00:00", "author": "a"}\n'
+            )
+        output, errors = StringIO(), StringIO()
+        call_command('import_jsonl', self.path, stdout=output,
+                     stderr=errors)
+
+        self.assertEqual(Comment.objects.get().text, 'Есть')
+        self.assertEqual(Post.objects.get().comment_count, 1)
+        self.assertIn('Строка 4', errors.getvalue())
+        self.assertIn('Строка 5', errors.getvalue())
+        self.assertIn('Загружено строк: 2, пропущено: 3', output.getvalue())
+
+
+    def test_imported_posts_do_not_reuse_archived_ids(self):
+        user = User.objects.create(username='a')
+        ArchivedPost.objects.create(
+            id=1, text='Архивная запись', author=user,
+            pub_date='2019-01-01T00:00:00+00:00',
+        )
+        with open(self.path, 'w') as jsonl:
+            jsonl.write(
+                '{"model": "post", "id": 1, "text": "Запись", '
+                '"pub_date": "2020-01-01T00:00:00+00:00", "author": "a"}\n'
+            )
+        call_command('import_jsonl', self.path, stdout=StringIO())
+
+        self.assertEqual(Post.objects.get().pk, 2)
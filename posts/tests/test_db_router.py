@@ -0,0 +1,160 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from yatube.db_router import (STICKY_COOKIE, ReplicaRouter,
+                              ReplicaRoutingMiddleware, copy_database,
+                              use_replicas)
+
+from ..models import Post
+
+User = get_user_model()
+
+
+@mock.patch('yatube.db_router.separate_replicas', lambda: ['replica1'])
+@mock.patch('yatube.db_router.changed_recently', lambda *args: False)
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+        self.middleware = ReplicaRoutingMiddleware(self.record_read_db)
+
+
+    def record_read_db(self, request):
+        self.read_db = self.router.db_for_read(Post)
+        return HttpResponse()
+
+
+    def test_reads_use_replica_only_inside_context(self):
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        with use_replicas():
+            self.assertEqual(self.router.db_for_read(Post), 'replica1')
+            self.assertEqual(self.router.db_for_read(Session), 'default')
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+        with self.settings(DATABASE_REPLICAS=['replica1']):
+            self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+
+
+    def test_feed_views_read_from_replica(self):
+        for url in ('/', '/group/test-group/', '/test_user/',
+                    '/test_user/1/'):
+            with self.subTest(url=url):
+                self.middleware(self.factory.get(url))
+                self.assertEqual(self.read_db, 'replica1')
+
+
+    def test_other_views_read_from_primary(self):
+        for request in (self.factory.get('/new/'),
+                        self.factory.get('/auth/signup/'),
+                        self.factory.post('/')):
+            with self.subTest(request=request):
+                self.middleware(request)
+                self.assertEqual(self.read_db, 'default')
+
+
+    def test_writer_sticks_to_primary(self):
+        response = self.middleware(self.factory.post('/new/'))
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+        request = self.factory.get('/')
+        request.COOKIES[STICKY_COOKIE] = response.cookies[STICKY_COOKIE].value
+        self.middleware(request)
+        self.assertEqual(self.read_db, 'default')
+
+
+class CopyDatabaseTests(SimpleTestCase):
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.primary = os.path.join(self.dirname, 'primary.sqlite3')
+        self.replica = os.path.join(self.dirname, 'replica.sqlite3')
+
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname, ignore_errors=True)
+
+
+    def execute(self, path, sql):
+        connection = sqlite3.connect(path)
+        try:
+            with connection:
+                return connection.execute(sql).fetchall()
+        finally:
+            connection.close()
+
+
+    def test_replica_follows_primary(self):
+        self.execute(self.primary, 'CREATE TABLE post (text TEXT)')
+        self.execute(self.primary, "INSERT INTO post VALUES ('Запись')")
+        copy_database(self.primary, self.replica)
+        self.assertEqual(
+            self.execute(self.replica, 'SELECT text FROM post'), [('Запись',)]
+        )
+
+        self.execute(self.primary, "INSERT INTO post VALUES ('Еще одна')")
+        self.assertEqual(
+            self.execute(self.replica, 'SELECT COUNT(*) FROM post'), [(1,)]
+        )
+        copy_database(self.primary, self.replica)
+        self.assertEqual(
+            self.execute(self.replica, 'SELECT COUNT(*) FROM post'), [(2,)]
+        )
+
+
+@override_settings(DATABASE_REPLICAS=['lagging'])
+class LaggingReplicaTests(TransactionTestCase):
+    """Реплика — отдельный файл, который после записи не обновляется."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='author')
+        Post.objects.create(text='Старая запись', author=self.author)
+        self.dirname = tempfile.mkdtemp()
+        replica = sqlite3.connect(os.path.join(self.dirname, 'replica.db'))
+        connections['default'].ensure_connection()
+        connections['default'].connection.backup(replica)
+        replica.close()
+        connections.databases['lagging'] = dict(
+            connections['default'].settings_dict,
+            NAME=os.path.join(self.dirname, 'replica.db'),
+        )
+
+
+    def tearDown(self):
+        connections['lagging'].close()
+        del connections['lagging']
+        del connections.databases['lagging']
+        shutil.rmtree(self.dirname, ignore_errors=True)
+
+
+    def texts(self, url):
+        response = self.client.get(url)
+        return [post.text for post in response.context['page']]
+
+
+    def test_pages_changed_within_lag_are_read_from_primary(self):
+        Post.objects.create(text='Новая запись', author=self.author)
+        urls = (
+            reverse('index'),
+            reverse('profile', kwargs={'username': self.author.username}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.texts(url), ['Новая запись', 'Старая запись']
+                )
+
+        # Когда окно отставания прошло, ленты снова читают с реплики.
+        cache.clear()
+        with self.settings(REPLICA_MAX_LAG_SECONDS=0):
+            self.assertEqual(self.texts(reverse('index')), ['Старая запись'])
@@ -0,0 +1,142 @@
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts import constants
+
+from ..deletion import BulkDeleter
+from ..jobs import run_pending
+from ..models import (AuthorCounter, Comment, Follow, Group, Job, Post,
+                      TimelineEntry)
+from ..search import SearchPaginator
+
+User = get_user_model()
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BulkDeleterTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+
+    def setUp(self):
+        self.spammer = User.objects.create(username='spammer')
+        self.reader = User.objects.create(username='reader')
+        self.group = Group.objects.create(
+            title='Тестовое сообщество', slug='test-group'
+        )
+        self.reader_post = Post.objects.create(
+            text='Запись читателя', author=self.reader, group=self.group
+        )
+        for n in range(5):
+            post = Post.objects.create(
+                text=f'Спам {n}', author=self.spammer, group=self.group
+            )
+            Comment.objects.create(
+                post=post, author=self.reader, text='Ответ на спам'
+            )
+            Comment.objects.create(
+                post=self.reader_post, author=self.spammer, text='Спам'
+            )
+        Follow.objects.create(user=self.reader, author=self.spammer)
+        Follow.objects.create(user=self.spammer, author=self.reader)
+        TimelineEntry.objects.bulk_create([
+            TimelineEntry(user=self.reader, post=post, pub_date=post.pub_date)
+            for post in self.spammer.posts.all()
+        ])
+        self.stages = []
+
+
+    def progress(self, stage, count):
+        self.stages.append((stage, count))
+
+
+    def test_user_is_deleted_in_batches_with_side_effects(self):
+        BulkDeleter(2, progress=self.progress).delete_user(self.spammer)
+
+        self.assertFalse(User.objects.filter(username='spammer').exists())
+        self.assertEqual(list(Post.objects.all()), [self.reader_post])
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.reader_post.refresh_from_db()
+        self.assertEqual(self.reader_post.comment_count, 0)
+        counter = AuthorCounter.objects.get(user=self.reader)
+        self.assertEqual(
+            (counter.followers_count, counter.following_count), (0, 0)
+        )
+        self.assertIn(('posts', 5), self.stages)
+        self.assertIn(('comments', 5), self.stages)
+        self.assertEqual(len(SearchPaginator('Спам', 10).get_page()), 0)
+
+
+    def test_group_posts_are_detached_in_batches(self):
+        BulkDeleter(2, progress=self.progress).clear_group(self.group)
+
+        self.assertFalse(Group.objects.exists())
+        self.assertEqual(Post.objects.count(), 6)
+        self.assertFalse(Post.objects.exclude(group=None).exists())
+        self.assertEqual(self.stages[-1], ('group posts', 6))
+
+
+    def test_media_is_removed_in_background_unless_shared(self):
+        shared = default_storage.save(
+            'posts/shared.gif', ContentFile(constants.small_gif)
+        )
+        own = default_storage.save(
+            'posts/own.gif', ContentFile(constants.small_gif)
+        )
+        Post.objects.filter(text='Спам 0').update(image=shared)
+        Post.objects.filter(text='Спам 1').update(image=own)
+        Post.objects.filter(pk=self.reader_post.pk).update(image=shared)
+        Job.objects.all().delete()
+
+        BulkDeleter(10).delete_posts(Post.objects.filter(author=self.spammer))
+        self.assertTrue(default_storage.exists(own))
+
+        run_pending()
+        self.assertFalse(default_storage.exists(own))
+        self.assertTrue(default_storage.exists(shared))
+
+
+    def test_admin_action_deletes_in_background(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        Job.objects.all().delete()
+        response = self.client.post(reverse('admin:auth_user_changelist'), {
+            'action': 'background_delete_users',
+            '_selected_action': [self.spammer.pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(User.objects.filter(username='spammer').exists())
+
+        run_pending()
+        self.assertFalse(User.objects.filter(username='spammer').exists())
+        self.assertEqual(Post.objects.count(), 1)
+
+
+    def test_admin_has_no_builtin_delete_action(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        for url in ('admin:auth_user_changelist', 'admin:posts_post_changelist',
+                    'admin:posts_group_changelist'):
+            with self.subTest(url=url):
+                response = self.client.get(reverse(url))
+                choices = dict(
+                    response.context['action_form'].fields['action'].choices
+                )
+                self.assertNotIn('delete_selected', choices)
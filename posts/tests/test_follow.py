@@ -0,0 +1,177 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..jobs import run_pending
+from ..models import AuthorCounter, Follow, Job, Post, TimelineEntry
+from ..timelines import TimelinePaginator
+
+User = get_user_model()
+
+
+class FollowTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='author')
+
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+
+    def follow(self, user=None, author=None):
+        client = self.reader_client
+        if user is not None:
+            client = Client()
+            client.force_login(user)
+        return client.post(reverse('profile_follow', kwargs={
+            'username': (author or self.author).username
+        }))
+
+
+    def counter(self, user):
+        return AuthorCounter.objects.get(user=user)
+
+
+    def feed(self, user=None, **params):
+        client = self.reader_client
+        if user is not None:
+            client = Client()
+            client.force_login(user)
+        response = client.get(reverse('follow_index'), params)
+        return [post.text for post in response.context['page']]
+
+
+    def test_follow_updates_counters_and_backfills_timeline(self):
+        Post.objects.create(text='Старая запись', author=self.author)
+        response = self.follow()
+        self.assertRedirects(response, reverse(
+            'profile', kwargs={'username': self.author.username}
+        ))
+        self.assertEqual(self.counter(self.author).followers_count, 1)
+        self.assertEqual(self.counter(self.reader).following_count, 1)
+
+        run_pending()
+        self.assertEqual(self.feed(), ['Старая запись'])
+
+        response = self.reader_client.get(reverse(
+            'profile', kwargs={'username': self.author.username}
+        ))
+        self.assertContains(response, 'Подписчиков: 1')
+        self.assertContains(response, 'Отписаться')
+
+
+    def test_follow_requires_post_and_other_author(self):
+        url = reverse('profile_follow', kwargs={
+            'username': self.author.username
+        })
+        self.assertEqual(self.reader_client.get(url).status_code, 405)
+        self.follow(author=self.reader)
+        self.assertFalse(Follow.objects.exists())
+
+
+    @mock.patch('posts.constants.fan_out_batch_size', 2)
+    def test_new_post_is_fanned_out_in_batches(self):
+        followers = [self.reader] + [
+            User.objects.create(username=f'follower{n}') for n in range(2)
+        ]
+        for user in followers:
+            self.follow(user=user)
+        run_pending()
+
+        Post.objects.create(text='Новая запись', author=self.author)
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(TimelineEntry.objects.count(), 2)
+        self.assertEqual(run_pending(), 1)
+        for user in followers:
+            with self.subTest(user=user):
+                self.assertEqual(self.feed(user), ['Новая запись'])
+
+
+    @mock.patch('posts.constants.celebrity_follower_threshold', 1)
+    def test_celebrity_posts_are_read_on_demand(self):
+        self.follow()
+        Post.objects.create(text='Запись звезды', author=self.author)
+        self.assertFalse(Job.objects.exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed(), ['Запись звезды'])
+
+
+    @mock.patch('posts.constants.celebrity_follower_threshold', 2)
+    def test_feed_merges_timeline_and_celebrity_posts(self):
+        star = User.objects.create(username='star')
+        fan = User.objects.create(username='fan')
+        self.follow(author=star)
+        self.follow(user=fan, author=star)
+        self.follow()
+        run_pending()
+        expected = []
+        for n in range(5):
+            for author in (self.author, star):
+                Post.objects.create(text=f'{author} {n}', author=author)
+                expected.insert(0, f'{author} {n}')
+        run_pending()
+        # Рассылка записей звезды, сделанная до того, как она стала
+        # популярной, не дублирует записи в ленте.
+        TimelineEntry.objects.bulk_create([
+            TimelineEntry(user=self.reader, post=post, pub_date=post.pub_date)
+            for post in star.posts.all()[:2]
+        ])
+
+        paginator = TimelinePaginator(self.reader, 4)
+        page = paginator.get_page()
+        texts = [post.text for post in page]
+        while page.has_next():
+            page = paginator.get_page(after=page.next_page_number())
+            texts += [post.text for post in page]
+        self.assertEqual(texts, expected)
+
+        page = paginator.get_page(before=page.previous_page_number())
+        self.assertEqual([post.text for post in page], expected[4:8])
+
+
+    @mock.patch('posts.constants.celebrity_follower_threshold', 2)
+    def test_posts_stay_in_feed_after_author_loses_popularity(self):
+        fan = User.objects.create(username='fan')
+        self.follow()
+        self.follow(user=fan)
+        run_pending()
+        Post.objects.create(text='Запись звезды', author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+
+        client = Client()
+        client.force_login(fan)
+        client.post(reverse('profile_unfollow', kwargs={
+            'username': self.author.username
+        }))
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(self.feed(), ['Запись звезды'])
+
+
+    def test_unfollow_cleans_timeline(self):
+        Post.objects.create(text='Запись', author=self.author)
+        self.follow()
+        run_pending()
+        self.reader_client.post(reverse('profile_unfollow', kwargs={
+            'username': self.author.username
+        }))
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.counter(self.author).followers_count, 0)
+        self.assertEqual(self.feed(), [])
+
+
+    def test_reconcile_repairs_follow_counters(self):
+        self.follow()
+        AuthorCounter.objects.update(followers_count=5, following_count=5)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(self.counter(self.author).followers_count, 1)
+        self.assertEqual(self.counter(self.author).following_count, 0)
+        self.assertEqual(self.counter(self.reader).following_count, 1)
@@ -1,23 +1,34 @@
+import os
 import shutil
 import tempfile
+from io import BytesIO
+from unittest import mock
 
-from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from posts import constants
 
 from ..forms import PostForm
+from ..images import is_incoming
+from ..jobs import run_pending
 from ..models import Group, Post
 
 User = get_user_model()
 
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
-        settings.MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
         cls.form = PostForm()
         cls.test_user = User.objects.create(
             username='test_user'
@@ -34,8 +45,8 @@ class PostFormTests(TestCase):
 
     @classmethod
     def tearDownClass(cls):
-        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
         super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
 
     def test_form_labels(self):
@@ -180,3 +191,99 @@ class PostFormTests(TestCase):
         )
         self.assertEqual(Post.objects.count(), posts_count+1)
         self.assertRedirects(response, reverse('index'))
+
+
+def photo(name='photo.jpg'):
+    buffer = BytesIO()
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    exif[0x010F] = 'Тестовая камера'
+    Image.new('RGB', (200, 100), 'red').save(buffer, 'JPEG', exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+@mock.patch('posts.constants.image_max_size', (64, 64))
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_user = User.objects.create(username='test_user')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.test_user)
+
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+
+    def create_post(self, image):
+        self.authorized_client.post(
+            reverse('new_post'),
+            data={'text': 'Запись с картинкой', 'image': image},
+        )
+        return Post.objects.latest('pk')
+
+
+    def test_upload_is_normalized_in_background(self):
+        post = self.create_post(photo())
+        incoming = post.image.name
+        self.assertTrue(is_incoming(incoming))
+
+        run_pending()
+
+        post.refresh_from_db()
+        self.assertFalse(is_incoming(post.image.name))
+        self.assertRegex(post.image.name, r'^posts/\w\w/\w{64}\.jpg$')
+        self.assertFalse(default_storage.exists(incoming))
+        with Image.open(post.image.path) as image:
+            # Картинка повернута по EXIF, уменьшена и без метаданных.
+            self.assertEqual(image.size, (32, 64))
+            self.assertEqual(len(image.getexif()), 0)
+        self.assertEqual((post.image_width, post.image_height), (32, 64))
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,')
+        )
+
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.create_post(photo('first.jpg'))
+        second = self.create_post(photo('second.jpg'))
+        run_pending()
+        run_pending()
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(first.thumbnail.name, second.thumbnail.name)
+        directory = os.path.dirname(first.image.path)
+        self.assertEqual(len(os.listdir(directory)), 1)
+
+
+    def test_edit_post_replaces_image(self):
+        post = Post.objects.create(
+            text='Тестовый текст записи', author=self.test_user
+        )
+        self.authorized_client.post(
+            reverse('post_edit', kwargs={
+                'username': 'test_user', 'post_id': post.id
+            }),
+            data={'text': post.text, 'image': photo()},
+        )
+        run_pending()
+        post.refresh_from_db()
+        self.assertTrue(post.image)
+        self.assertFalse(is_incoming(post.image.name))
+
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=100)
+    def test_oversized_upload_is_rejected(self):
+        response = self.authorized_client.post(
+            reverse('new_post'),
+            data={'text': 'Слишком большая картинка', 'image': photo()},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('image', response.context['form'].errors)
+        self.assertFalse(Post.objects.exists())
@@ -0,0 +1,130 @@
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from posts import constants
+
+from ..jobs import claim_jobs, enqueue, job_stats, run_pending
+from ..models import Job, Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+calls = []
+
+
+def record(value):
+    calls.append(value)
+
+
+def fail():
+    raise ValueError('Сбой задачи')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+
+    def test_job_runs_once(self):
+        enqueue(record, 'значение', key='record:1')
+        enqueue(record, 'значение', key='record:1')
+        self.assertEqual(Job.objects.count(), 1)
+
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(run_pending(), 0)
+        self.assertEqual(calls, ['значение'])
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.DONE, 1))
+
+
+    def test_key_is_released_when_job_finishes(self):
+        enqueue(record, 'первый', key='record:1')
+        run_pending()
+        enqueue(fail, key='record:1', max_attempts=1)
+        run_pending()
+        enqueue(record, 'второй', key='record:1')
+        run_pending()
+        self.assertEqual(calls, ['первый', 'второй'])
+        self.assertEqual(Job.objects.filter(status=Job.FAILED).count(), 1)
+
+
+    def test_failed_job_is_retried_then_given_up(self):
+        enqueue(fail, max_attempts=2)
+        run_pending()
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertIn('Сбой задачи', job.error)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertEqual(run_pending(), 0)
+
+        Job.objects.update(run_after=timezone.now())
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+
+    def test_rolled_back_write_leaves_no_job(self):
+        try:
+            with transaction.atomic():
+                enqueue(record, 'откат')
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertFalse(Job.objects.exists())
+
+
+    def test_stale_running_job_is_reclaimed(self):
+        job = enqueue(record, 'зависшая')
+        self.assertEqual(claim_jobs(10), [job])
+        self.assertEqual(claim_jobs(10), [])
+        Job.objects.update(started=timezone.now() - timedelta(
+            seconds=constants.job_timeout_seconds + 1
+        ))
+        self.assertEqual(claim_jobs(10), [job])
+
+
+    def test_stats_report_latency(self):
+        enqueue(record, 'замер')
+        run_pending()
+        stats = job_stats(timezone.now() - timedelta(hours=1))
+        item = stats['posts.tests.test_jobs.record']
+        self.assertEqual(item['statuses'], {Job.DONE: 1})
+        self.assertEqual(len(item['waits']), 1)
+        self.assertGreaterEqual(item['runs'][0], 0)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailJobTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+
+    def test_new_post_enqueues_thumbnail(self):
+        user = get_user_model().objects.create(username='test_user')
+        post = Post.objects.create(
+            text='Тестовый пост',
+            author=user,
+            image=SimpleUploadedFile('small.gif', constants.small_gif),
+        )
+        job = Job.objects.get()
+        self.assertEqual(job.task, 'posts.images.process_image')
+        self.assertFalse(post.thumbnail)
+
+        run_pending()
+        self.assertEqual(
+            Job.objects.get(status=Job.PENDING).task,
+            'posts.thumbnails.make_thumbnail'
+        )
+        run_pending()
+
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnail)
+        self.assertFalse(Job.objects.exclude(status=Job.DONE).exists())
@@ -0,0 +1,130 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..metrics import get_store, observe_duration
+
+CHILD = '''
+import sys
+from posts.metrics import MetricsStore
+MetricsStore(sys.argv[1]).add([
+    (('yatube_http_requests_total',
+      'view="index",method="GET",status="200"', '', 0), 5),
+    (('yatube_http_requests_in_flight', '', '', int(sys.argv[2])), 3),
+])
+'''
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory(dir=settings.BASE_DIR)
+        cls.settings_override = override_settings(
+            METRICS_PATH=os.path.join(cls.directory.name, 'metrics.sqlite3')
+        )
+        cls.settings_override.enable()
+
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+
+    def setUp(self):
+        cache.clear()
+        get_store().clear()
+
+
+    def scrape(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        return response.content.decode()
+
+
+    def test_requests_are_counted_by_url_name(self):
+        self.client.get(reverse('index'))
+        self.client.get(reverse('index'))
+        metrics = self.scrape()
+        self.assertIn(
+            'yatube_http_requests_total'
+            '{view="index",method="GET",status="200"} 2', metrics
+        )
+        self.assertIn(
+            'yatube_http_request_duration_seconds_bucket'
+            '{view="index",le="+Inf"} 2', metrics
+        )
+        self.assertIn(
+            'yatube_http_request_duration_seconds_count{view="index"} 2',
+            metrics
+        )
+        self.assertIn(
+            'yatube_db_queries_per_request_count{view="index"} 2', metrics
+        )
+        self.assertIn('yatube_http_requests_in_flight 1', metrics)
+
+
+    def test_cache_layers_report_hits_and_misses(self):
+        self.client.get(reverse('index'))
+        self.client.get(reverse('index'))
+        metrics = self.scrape()
+        self.assertIn(
+            'yatube_cache_requests_total{layer="page",result="miss"} 1',
+            metrics
+        )
+        self.assertIn(
+            'yatube_cache_requests_total{layer="page",result="hit"} 1',
+            metrics
+        )
+        self.assertIn(
+            'yatube_cache_requests_total{layer="count",result="miss"} 1',
+            metrics
+        )
+
+
+    def test_histogram_buckets_are_cumulative(self):
+        with observe_duration(
+            'yatube_thumbnail_duration_seconds', stage='variants'
+        ):
+            pass
+        metrics = self.scrape()
+        self.assertIn(
+            'yatube_thumbnail_duration_seconds_bucket'
+            '{stage="variants",le="0.05"} 1', metrics
+        )
+        self.assertIn(
+            'yatube_thumbnail_duration_seconds_bucket'
+            '{stage="variants",le="30"} 1', metrics
+        )
+
+
+    def test_samples_of_other_processes_are_summed(self):
+        self.client.get(reverse('index'))
+        path = settings.METRICS_PATH
+        # Датчик живого процесса учитывается, завершившегося — нет.
+        child = subprocess.run(
+            [sys.executable, '-c', CHILD, path, str(os.getpid())],
+            cwd=settings.BASE_DIR, check=True,
+        )
+        self.assertEqual(child.returncode, 0)
+        finished = subprocess.Popen([sys.executable, '-c', ''])
+        finished.wait()
+        subprocess.run(
+            [sys.executable, '-c', CHILD, path, str(finished.pid)],
+            cwd=settings.BASE_DIR, check=True,
+        )
+        metrics = self.scrape()
+        self.assertIn(
+            'yatube_http_requests_total'
+            '{view="index",method="GET",status="200"} 11', metrics
+        )
+        self.assertIn('yatube_http_requests_in_flight 4', metrics)
@@ -1,7 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import AuthorCounter, Comment, Group, GroupCounter, Post
 
 User = get_user_model()
 
@@ -92,3 +92,84 @@ class PostFormTest(TestCase):
         t = test_post.text[:20]
         expected_post_text = f'{a} - {d:%d-%m-%Y} - {t} ...'
         self.assertEquals(expected_post_text, str(test_post))
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.test_user = User.objects.create(username='test_user')
+        self.commentator = User.objects.create(username='commentator')
+
+
+    def create_post(self, comments=0):
+        post = Post.objects.create(text='Тестовый пост', author=self.test_user)
+        for n in range(comments):
+            Comment.objects.create(
+                post=post, author=self.commentator, text=f'Комментарий {n}'
+            )
+        post.refresh_from_db()
+        return post
+
+
+    def posts_count(self):
+        return AuthorCounter.objects.get(user=self.test_user).posts_count
+
+
+    def test_counters_follow_creates_and_deletes(self):
+        post = self.create_post(comments=3)
+        self.assertEqual(post.comment_count, 3)
+        self.assertEqual(self.posts_count(), 1)
+
+        post.comments.first().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 2)
+
+        Comment.objects.filter(post=post).delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+
+        post.delete()
+        self.assertEqual(self.posts_count(), 0)
+
+
+    def test_counters_follow_cascade_deletes(self):
+        post = self.create_post()
+        Comment.objects.create(post=post, author=self.test_user, text='Свой')
+        self.commentator.posts.create(text='Чужой пост')
+        foreign_post = Post.objects.get(author=self.commentator)
+        Comment.objects.create(
+            post=foreign_post, author=self.test_user, text='Чужой'
+        )
+
+        user_pk = self.test_user.pk
+        self.test_user.delete()
+        foreign_post.refresh_from_db()
+        self.assertEqual(foreign_post.comment_count, 0)
+        self.assertFalse(
+            AuthorCounter.objects.filter(user_id=user_pk).exists()
+        )
+
+
+    def test_group_counter_follows_posts(self):
+        first = Group.objects.create(title='Первое', slug='first')
+        second = Group.objects.create(title='Второе', slug='second')
+
+        def counts():
+            return {
+                counter.group_id: counter.posts_count
+                for counter in GroupCounter.objects.all()
+            }
+
+        post = Post.objects.create(
+            text='Тестовый пост', author=self.test_user, group=first
+        )
+        self.assertEqual(counts(), {first.pk: 1})
+
+        # Сохранение устаревшего экземпляра сообщества счетчик не трогает.
+        first.title = 'Переименованное'
+        first.save()
+        post.group = second
+        post.save()
+        self.assertEqual(counts(), {first.pk: 0, second.pk: 1})
+
+        post.delete()
+        self.assertEqual(counts(), {first.pk: 0, second.pk: 0})
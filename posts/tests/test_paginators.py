@@ -0,0 +1,148 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from posts import constants
+
+from ..models import Post
+from ..paginators import CursorPaginator, WindowedPaginator
+
+User = get_user_model()
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='test_user')
+        Post.objects.bulk_create(
+            Post(text=f'Запись {n}', author=cls.user) for n in range(25)
+        )
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True
+            )
+        )
+
+
+    def walk(self, paginator):
+        page = paginator.get_page()
+        pages = [page]
+        while page.has_next():
+            page = paginator.get_page(after=page.next_page_number())
+            pages.append(page)
+        return pages
+
+
+    def test_pages_cover_all_posts_once(self):
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        pages = self.walk(paginator)
+        walked = [post.pk for page in pages for post in page]
+        self.assertEqual(walked, self.expected)
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertFalse(pages[0].has_previous())
+
+
+    def test_before_returns_previous_page(self):
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        pages = self.walk(paginator)
+        previous = paginator.get_page(
+            before=pages[2].previous_page_number()
+        )
+        self.assertEqual(list(previous), list(pages[1]))
+        first = paginator.get_page(before=pages[1].previous_page_number())
+        self.assertEqual(list(first), list(pages[0]))
+        self.assertFalse(first.has_previous())
+
+
+    def test_page_fetch_skips_count(self):
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        page = paginator.get_page()
+        with CaptureQueriesContext(connection) as queries:
+            paginator.get_page(after=page.next_page_number())
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('COUNT', queries[0]['sql'])
+        self.assertNotIn('OFFSET', queries[0]['sql'])
+
+
+    def test_invalid_token_returns_first_page(self):
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        page = paginator.get_page(after='not-a-token')
+        self.assertEqual([post.pk for post in page], self.expected[:10])
+
+
+
+class WindowedPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='test_user')
+        Post.objects.bulk_create(
+            Post(text=f'Запись {n}', author=cls.user) for n in range(25)
+        )
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True
+            )
+        )
+
+
+    def setUp(self):
+        cache.clear()
+
+
+    def test_window_skips_distant_pages(self):
+        paginator = WindowedPaginator(Post.objects.all(), 1, window=2)
+        self.assertEqual(
+            paginator.window(10), [1, None, 8, 9, 10, 11, 12, None, 25]
+        )
+        self.assertEqual(paginator.window(1), [1, 2, 3, None, 25])
+        self.assertEqual(paginator.window(24), [1, None, 22, 23, 24, 25])
+
+
+    def test_numbers_stop_at_max_pages_then_cursor_continues(self):
+        paginator = WindowedPaginator(Post.objects.all(), 10, max_pages=2)
+        self.assertEqual(paginator.num_pages, 2)
+        last = paginator.get_page(99)
+        self.assertEqual(last.number, 2)
+        self.assertTrue(last.has_next())
+        self.assertTrue(last.next_page_query().startswith('after='))
+
+        after = paginator.cursor(last[-1])
+        rest = CursorPaginator(Post.objects.all(), 10).get_page(after=after)
+        walked = [post.pk for page in (paginator.get_page(1), last, rest)
+                  for post in page]
+        self.assertEqual(walked, self.expected)
+
+
+    def test_count_is_cached_under_given_key(self):
+        paginator = WindowedPaginator(
+            Post.objects.all(), 10, count_key='count:test'
+        )
+        self.assertEqual(paginator.count, 25)
+        Post.objects.filter(pk=self.expected[0]).delete()
+        paginator = WindowedPaginator(
+            Post.objects.all(), 10, count_key='count:test'
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 25)
+
+
+    def test_feed_renders_only_window(self):
+        Post.objects.bulk_create(
+            Post(text=f'Еще запись {n}', author=self.user)
+            for n in range(constants.posts_per_page * 30)
+        )
+        response = self.client.get(reverse('index'), {'page': 15})
+        self.assertEqual(response.context['page'].number, 15)
+        links = response.content.decode().count('href="?page=')
+        self.assertLessEqual(links, 2 * constants.page_window + 4)
+        last_page = response.context['paginator'].num_pages
+        self.assertEqual(last_page, 33)
+        self.assertContains(
+            response, f'href="?{urlencode({"page": last_page})}"'
+        )
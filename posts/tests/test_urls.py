@@ -1,6 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.contrib.flatpages.models import FlatPage
 from django.contrib.sites.models import Site
+from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
 
@@ -67,6 +68,10 @@ class PostsUrlTest(TestCase):
         }
 
 
+    def setUp(self):
+        cache.clear()
+
+
     def test_guest_access_urls_exist(self):
         for template, url in self.template_guest_access_urls.items():
             with self.subTest(url=url):
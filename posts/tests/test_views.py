@@ -2,17 +2,21 @@ import shutil
 import tempfile
 
 from django import forms
-from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.flatpages.models import FlatPage
 from django.contrib.sites.models import Site
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
 from posts import constants
+from posts.cache import get_hit_ratio
+from posts.metrics import get_store
 
-from ..models import Group, Post
+from ..models import Comment, Group, Post
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
 
 
 class StaticURLTests(TestCase):
@@ -48,11 +52,11 @@ class StaticURLTests(TestCase):
         )
 
 
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class ViewPagesTests(TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
-        settings.MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
         User = get_user_model()
         cls.user = User.objects.create(
             username='test_user'
@@ -96,8 +100,12 @@ class ViewPagesTests(TestCase):
 
     @classmethod
     def tearDownClass(cls):
-        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
         super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+
+    def setUp(self):
+        cache.clear()
 
 
     def test_posts_pages_uses_correct_template(self):        
@@ -141,6 +149,7 @@ class ViewPagesTests(TestCase):
             form_fields = {
                 'group': forms.fields.ChoiceField,      
                 'text': forms.fields.CharField,
+                'image': forms.fields.ImageField,
             }
             
             for value, expected in form_fields.items():
@@ -220,7 +229,7 @@ class ViewPagesTests(TestCase):
         self.assertEqual(posts_on_page, constants.posts_per_page)
 
         index = response.context.get('paginator').page(1)
-        posts_count = index.object_list.count() <= constants.posts_per_page
+        posts_count = len(index.object_list) <= constants.posts_per_page
         self.assertTrue(posts_count)
 
         all_posts_count = Post.objects.count()
@@ -231,10 +240,413 @@ class ViewPagesTests(TestCase):
     def test_index_cache(self):
         self.assertEqual(Post.objects.count(), 1)
         response1 = self.client.get(reverse('index')).content
-        Post.objects.all().delete()
-        self.assertEqual(Post.objects.count(), 0)
+        # update() не вызывает сигналы, и версия ленты не меняется.
+        Post.objects.all().update(text='Измененный текст')
+        self.assertEqual(Post.objects.count(), 1)
         response2 = self.client.get(reverse('index')).content
         self.assertEqual(response1, response2)
         cache.clear()
         response3 = self.client.get(reverse('index')).content
         self.assertNotEqual(response1, response3)
+
+
+class FeedQueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(username='test_user')
+        cls.commentator = get_user_model().objects.create(
+            username='commentator'
+        )
+        cls.test_group = Group.objects.create(
+            title='Тестовое сообщество',
+            slug='test-group',
+            description='test-group',
+        )
+        # С пустым кешем: индексу нужен еще подсчет записей для номеров
+        # страниц, профилю и сообществу хватает их счетчиков.
+        cls.query_budgets = {
+            reverse('index'): 3,
+            reverse('group_posts', kwargs={'slug': cls.test_group.slug}): 2,
+            reverse('profile', kwargs={'username': cls.user.username}): 2,
+        }
+
+
+    def add_posts(self, count):
+        for n in range(count):
+            post = Post.objects.create(
+                text=f'Запись {n}',
+                author=self.user,
+                group=self.test_group,
+            )
+            Comment.objects.create(
+                post=post, author=self.commentator, text='Комментарий'
+            )
+
+
+    def test_feed_pages_query_budget_does_not_depend_on_page_size(self):
+        for posts_count in (1, constants.posts_per_page):
+            Post.objects.all().delete()
+            self.add_posts(posts_count)
+            for url, budget in self.query_budgets.items():
+                with self.subTest(url=url, posts_count=posts_count):
+                    cache.clear()
+                    with self.assertNumQueries(budget):
+                        response = self.client.get(url)
+                    self.assertEqual(
+                        len(response.context['page']), posts_count
+                    )
+                    self.assertContains(response, 'Комментариев: 1')
+
+
+    def test_post_view_query_budget(self):
+        self.add_posts(1)
+        post = Post.objects.get()
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('post', kwargs={'username': self.user.username,
+                        'post_id': post.pk})
+            )
+        self.assertContains(response, 'Комментариев: 1')
+
+
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(username='test_user')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+        for n in range(constants.comments_per_page + 5):
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий {n}'
+            )
+        cls.kwargs = {'username': cls.user.username, 'post_id': cls.post.pk}
+
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+
+    def test_first_page_links_to_fragment(self):
+        response = self.authorized_client.get(
+            reverse('add_comment', kwargs=self.kwargs)
+        )
+        page = response.context['page']
+        self.assertEqual(len(page), constants.comments_per_page)
+        self.assertEqual(page[0].text, f'Комментарий {len(page) + 4}')
+        self.assertContains(
+            response,
+            f'{reverse("post_comments", kwargs=self.kwargs)}?'
+            f'{page.next_page_query()}'
+        )
+
+
+    def test_fragment_returns_next_page_in_fixed_queries(self):
+        first = self.authorized_client.get(
+            reverse('add_comment', kwargs=self.kwargs)
+        ).context['page']
+        url = reverse('post_comments', kwargs=self.kwargs)
+        # Запись и страница комментариев вместе с авторами.
+        with self.assertNumQueries(2):
+            response = self.client.get(f'{url}?{first.next_page_query()}')
+        self.assertEqual(
+            [comment.text for comment in response.context['page']],
+            [f'Комментарий {n}' for n in range(4, -1, -1)]
+        )
+        self.assertNotContains(response, 'data-fragment')
+        self.assertNotContains(response, '<html')
+
+
+    def test_fragment_of_unknown_post_is_not_found(self):
+        response = self.client.get(reverse('post_comments', kwargs={
+            'username': 'nobody', 'post_id': self.post.pk
+        }))
+        self.assertEqual(response.status_code, 404)
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(username='test_user')
+        cls.test_group = Group.objects.create(
+            title='Тестовое сообщество',
+            slug='test-group',
+            description='test-group',
+        )
+        cls.group_url = reverse(
+            'group_posts', kwargs={'slug': cls.test_group.slug}
+        )
+
+
+    def setUp(self):
+        cache.clear()
+        get_store().clear()
+        self.post = Post.objects.create(
+            text='Тестовый пост', author=self.user, group=self.test_group
+        )
+
+
+    def test_card_is_rendered_once(self):
+        self.client.get(self.group_url)
+        self.client.get(reverse('profile', kwargs={'username': 'test_user'}))
+        self.assertEqual(get_hit_ratio('post_card'), (1, 1, 0.5))
+
+
+    def test_card_is_invalidated_on_write(self):
+        reader_client = Client()
+        reader_client.force_login(
+            get_user_model().objects.create(username='reader')
+        )
+        reader_client.get(self.group_url)
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        self.assertContains(reader_client.get(self.group_url), self.post.text)
+
+        Comment.objects.create(post=self.post, author=self.user, text='1')
+        self.assertContains(
+            reader_client.get(self.group_url), 'Комментариев: 1'
+        )
+
+        self.test_group.title = 'Новое название'
+        self.test_group.save()
+        self.assertContains(
+            reader_client.get(self.group_url), '#Новое название'
+        )
+
+
+    def test_edit_button_is_not_shared(self):
+        author_client = Client()
+        author_client.force_login(self.user)
+        self.assertContains(author_client.get(self.group_url), 'Редактировать')
+        self.assertNotContains(self.client.get(self.group_url), 'Редактировать')
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(username='test_user')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+        cls.test_group = Group.objects.create(
+            title='Тестовое сообщество',
+            slug='test-group',
+            description='test-group',
+        )
+        cls.feed_urls = (
+            reverse('index'),
+            reverse('group_posts', kwargs={'slug': cls.test_group.slug}),
+            reverse('profile', kwargs={'username': cls.user.username}),
+        )
+
+
+    def setUp(self):
+        cache.clear()
+
+
+    def test_cached_page_skips_database(self):
+        for url in self.feed_urls:
+            with self.subTest(url=url):
+                self.client.get(url)
+                with self.assertNumQueries(0):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+
+    def test_cursor_pages_are_cached_separately(self):
+        for n in range(constants.posts_per_page + 1):
+            Post.objects.create(text=f'Запись {n}', author=self.user)
+        first_page = self.client.get(reverse('index'))
+        next_page = first_page.context['page'].next_page_query()
+        second_page = self.client.get(f"{reverse('index')}?{next_page}")
+        self.assertNotEqual(first_page.content, second_page.content)
+
+
+    def test_writes_purge_affected_pages(self):
+        for url in self.feed_urls:
+            self.client.get(url)
+        self.authorized_client.post(
+            reverse('new_post'),
+            data={'text': 'Новая запись', 'group': self.test_group.id},
+        )
+        for url in self.feed_urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Новая запись')
+
+        post = Post.objects.get()
+        self.authorized_client.post(
+            reverse('add_comment', kwargs={'username': self.user.username,
+                    'post_id': post.id}),
+            data={'text': 'Комментарий'},
+        )
+        for url in self.feed_urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Комментариев: 1')
+
+
+class SearchViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(username='test_user')
+        cls.search_url = reverse('search')
+
+
+    def test_results_are_ranked_and_highlighted(self):
+        Post.objects.create(text='Кошки и собаки', author=self.user)
+        best = Post.objects.create(
+            text='Кошки, кошки и снова кошки', author=self.user
+        )
+        Post.objects.create(text='Про собак', author=self.user)
+
+        response = self.client.get(self.search_url, {'q': 'кошк'})
+        results = list(response.context['page'])
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0], best)
+        self.assertContains(response, '<mark>Кошки</mark>')
+
+
+    def test_index_follows_edits_and_deletes(self):
+        post = Post.objects.create(text='Старый <b>текст</b>', author=self.user)
+        post.text = 'Новый текст'
+        post.save()
+        response = self.client.get(self.search_url, {'q': 'старый'})
+        self.assertEqual(len(response.context['page']), 0)
+        response = self.client.get(self.search_url, {'q': 'новый'})
+        self.assertEqual(list(response.context['page']), [post])
+
+        post.delete()
+        response = self.client.get(self.search_url, {'q': 'новый'})
+        self.assertEqual(len(response.context['page']), 0)
+
+
+    def test_results_are_paginated_by_cursor(self):
+        for n in range(constants.posts_per_page + 3):
+            Post.objects.create(text=f'Запись номер {n}', author=self.user)
+        response = self.client.get(self.search_url, {'q': 'запись'})
+        first_page = response.context['page']
+        self.assertTrue(first_page.has_next())
+        self.assertContains(response, 'q=%D0%B7%D0%B0%D0%BF%D0%B8%D1%81%D1%8C')
+
+        response = self.client.get(self.search_url, {
+            'q': 'запись', 'after': first_page.next_page_number()
+        })
+        second_page = response.context['page']
+        self.assertEqual(len(second_page), 3)
+        self.assertFalse(set(first_page) & set(second_page))
+
+
+    def test_markup_in_snippet_is_escaped(self):
+        Post.objects.create(text='<script>кошка</script>', author=self.user)
+        response = self.client.get(self.search_url, {'q': 'кошка'})
+        self.assertNotContains(response, '<script>')
+
+
+class ServerTimingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(username='test_user')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+        Post.objects.create(text='Тестовая запись', author=cls.user)
+
+
+    def setUp(self):
+        cache.clear()
+
+
+    def test_header_reports_sql_and_templates(self):
+        response = self.authorized_client.get(reverse('index'))
+        metrics = dict(
+            metric.split(';')[0:2]
+            for metric in response['Server-Timing'].split(', ')
+        )
+        self.assertEqual(set(metrics), {'db', 'tpl', 'total'})
+        for duration in metrics.values():
+            self.assertRegex(duration, r'^dur=\d+\.\d$')
+
+
+    def test_cached_page_has_no_sql_timing(self):
+        self.client.get(reverse('index'))
+        response = self.client.get(reverse('index'))
+        self.assertTrue(response['Server-Timing'].startswith('total;'))
+
+
+    def test_request_is_logged(self):
+        with self.assertLogs('posts.timing', 'INFO') as logs:
+            self.authorized_client.get(reverse('index'))
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('view=index method=GET status=200', logs.output[0])
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(username='test_user')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+        cls.test_group = Group.objects.create(
+            title='Тестовое сообщество',
+            slug='test-group',
+            description='test-group',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовая запись', author=cls.user, group=cls.test_group
+        )
+        cls.urls = (
+            reverse('index'),
+            reverse('group_posts', kwargs={'slug': cls.test_group.slug}),
+            reverse('profile', kwargs={'username': cls.user.username}),
+            reverse('post', kwargs={'username': cls.user.username,
+                    'post_id': cls.post.id}),
+        )
+
+
+    def setUp(self):
+        cache.clear()
+
+
+    def test_unchanged_pages_are_not_rendered(self):
+        for client in (self.client, self.authorized_client):
+            for url in self.urls:
+                with self.subTest(url=url):
+                    response = client.get(url)
+                    self.assertTrue(response.has_header('Last-Modified'))
+                    not_modified = client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                    self.assertEqual(not_modified.status_code, 304)
+                    self.assertEqual(not_modified.templates, [])
+
+
+    def test_anonymous_check_skips_database(self):
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        with self.assertNumQueries(0):
+            for url, etag in zip(self.urls, etags):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+
+    def test_readers_get_different_etags(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertNotEqual(
+                    self.client.get(url)['ETag'],
+                    self.authorized_client.get(url)['ETag'],
+                )
+
+
+    def test_writes_change_etag(self):
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий'
+        )
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Комментариев: 1')
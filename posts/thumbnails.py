@@ -0,0 +1,106 @@
+import json
+import os
+
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from posts import constants
+from posts.cache import bump_version, post_version_key, purge_post_pages
+from posts.jobs import enqueue
+from posts.metrics import observe_duration
+from posts.timing import timed
+
+from .models import Post
+
+FORMATS = (('jpeg', 'jpg', 'JPEG'), ('webp', 'webp', 'WEBP'))
+
+
+def variant_name(image_name, width, extension):
+    stem = os.path.splitext(image_name)[0]
+    return f'thumbs/{width}w/{stem}.{extension}'
+
+
+def thumbnail_name(image_name):
+    return variant_name(image_name, constants.thumbnail_width, 'jpg')
+
+
+def image_variants(image_name):
+    """
+    Описание вариантов картинки, которое хранится в Post.image_variants.
+    Варианты сохраняют пропорции картинки, так что их высоты выводятся
+    из Post.image_width и Post.image_height.
+    """
+    return [
+        dict(
+            {'width': width},
+            **{
+                kind: variant_name(image_name, width, extension)
+                for kind, extension, _ in FORMATS
+            }
+        )
+        for width in constants.image_variant_widths
+    ]
+
+
+def render_thumbnail(source_path, target_path, width, image_format='JPEG'):
+    """Выполняется в дочернем процессе: только Pillow, без Django ORM."""
+    with Image.open(source_path) as image:
+        height = max(1, round(width * image.height / image.width))
+        image = image.convert('RGB').resize((width, height), Image.LANCZOS)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        image.save(
+            target_path, image_format, quality=constants.image_quality,
+            optimize=True,
+        )
+    return target_path
+
+
+def render_variants(source_path, image_name, force=False):
+    """
+    Выполняется в дочернем процессе: рисует недостающие варианты во всех
+    форматах. Имена выводятся из имени картинки, а у нормализованных
+    картинок оно выводится из содержимого, так что готовые файлы
+    подходят и повторно загруженной копии.
+    """
+    with observe_duration(
+        'yatube_thumbnail_duration_seconds', stage='variants'
+    ):
+        for variant in image_variants(image_name):
+            for kind, _, image_format in FORMATS:
+                target_path = default_storage.path(variant[kind])
+                if force or not os.path.exists(target_path):
+                    render_thumbnail(
+                        source_path, target_path, variant['width'],
+                        image_format
+                    )
+    return image_name
+
+
+def needs_thumbnail(post):
+    return bool(post.image) and (
+        post.thumbnail.name != thumbnail_name(post.image.name)
+        or post.image_variants != json.dumps(image_variants(post.image.name))
+    )
+
+
+def schedule_thumbnail(post_id, image_name):
+    with timed('thumb'):
+        return enqueue(
+            make_thumbnail, post_id, image_name,
+            key=f'thumbnail:{post_id}:{image_name}',
+        )
+
+
+def save_variants(post_id, image_name):
+    return Post.objects.filter(pk=post_id, image=image_name).update(
+        thumbnail=thumbnail_name(image_name),
+        image_variants=json.dumps(image_variants(image_name)),
+    )
+
+
+def make_thumbnail(post_id, image_name):
+    """Фоновая задача: варианты картинки, ссылки на них и сброс кешей."""
+    render_variants(default_storage.path(image_name), image_name)
+    if save_variants(post_id, image_name):
+        bump_version(post_version_key(post_id))
+        purge_post_pages(Post.objects.feed().get(pk=post_id))
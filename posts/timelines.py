@@ -0,0 +1,193 @@
+from django.db import transaction
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from posts import constants
+from posts.jobs import enqueue
+
+from .models import AuthorCounter, Follow, Post, TimelineEntry
+from .paginators import CursorPaginator
+
+
+def followers_count(author_id):
+    return AuthorCounter.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True
+    ).first() or 0
+
+
+def is_celebrity(count):
+    return count >= constants.celebrity_follower_threshold
+
+
+def schedule_fan_out(post):
+    """
+    Разносит новую запись по лентам подписчиков в фоне. Записи авторов
+    с огромным числом подписчиков не разносятся: их лента подписок
+    читает напрямую.
+    """
+    count = followers_count(post.author_id)
+    if count and not is_celebrity(count):
+        enqueue(fan_out_post, post.pk, 0, key=f'fan_out:{post.pk}:0')
+
+
+def fan_out_post(post_id, after_user_id):
+    """Фоновая задача: одна пачка подписчиков, затем следующая задача."""
+    post = Post.objects.filter(pk=post_id).values(
+        'author_id', 'pub_date'
+    ).first()
+    if post is None:
+        return
+    followers = list(
+        Follow.objects.filter(
+            author_id=post['author_id'], user_id__gt=after_user_id
+        ).order_by('user_id').values_list('user_id', flat=True)[
+            :constants.fan_out_batch_size
+        ]
+    )
+    with transaction.atomic():
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=user_id, post_id=post_id,
+                           pub_date=post['pub_date'])
+             for user_id in followers],
+            ignore_conflicts=True,
+        )
+        if len(followers) == constants.fan_out_batch_size:
+            enqueue(
+                fan_out_post, post_id, followers[-1],
+                key=f'fan_out:{post_id}:{followers[-1]}',
+            )
+
+
+def recent_posts(author_id):
+    return Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-pk'
+    ).values_list('pk', 'pub_date')[:constants.timeline_backfill_posts]
+
+
+def backfill_timeline(user_id, author_id):
+    """Фоновая задача: последние записи автора в ленту нового подписчика."""
+    if not Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        return
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in recent_posts(author_id)],
+        ignore_conflicts=True,
+    )
+
+
+def schedule_followers_backfill(author_id):
+    """
+    Автор только что перестал быть популярным: его записи больше не
+    подмешиваются в ленты при чтении, а записи, опубликованные, пока он
+    был популярным, не разносились. Последние из них дописываются в
+    ленты всех подписчиков.
+    """
+    threshold = constants.celebrity_follower_threshold
+    if followers_count(author_id) == threshold - 1:
+        enqueue(
+            backfill_followers, author_id, 0,
+            key=f'backfill_followers:{author_id}:0',
+        )
+
+
+def backfill_followers(author_id, after_user_id):
+    """Фоновая задача: одна пачка подписчиков, затем следующая задача."""
+    if is_celebrity(followers_count(author_id)):
+        # Снова популярен: записи читаются напрямую.
+        return
+    followers = list(
+        Follow.objects.filter(
+            author_id=author_id, user_id__gt=after_user_id
+        ).order_by('user_id').values_list('user_id', flat=True)[
+            :constants.fan_out_batch_size
+        ]
+    )
+    posts = list(recent_posts(author_id))
+    with transaction.atomic():
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+             for user_id in followers for pk, pub_date in posts],
+            ignore_conflicts=True,
+        )
+        if len(followers) == constants.fan_out_batch_size:
+            enqueue(
+                backfill_followers, author_id, followers[-1],
+                key=f'backfill_followers:{author_id}:{followers[-1]}',
+            )
+
+
+def follow(user, author):
+    _, created = Follow.objects.get_or_create(user=user, author=author)
+    if created and not is_celebrity(followers_count(author.pk)):
+        enqueue(
+            backfill_timeline, user.pk, author.pk,
+            key=f'backfill_timeline:{user.pk}:{author.pk}',
+        )
+    return created
+
+
+def unfollow(user, author):
+    # Удаление по одной строке, чтобы сработали сигналы счетчиков.
+    for subscription in Follow.objects.filter(user=user, author=author):
+        subscription.delete()
+        TimelineEntry.objects.filter(user=user, post__author=author).delete()
+
+
+def keyset(queryset, pk_field, key, pk, descending, limit):
+    lookup, order = ('lt', '-') if descending else ('gt', '')
+    if key is not None:
+        queryset = queryset.filter(
+            Q(**{f'pub_date__{lookup}': key})
+            | Q(pub_date=key, **{f'{pk_field}__{lookup}': pk})
+        )
+    return queryset.order_by(
+        f'{order}pub_date', f'{order}{pk_field}'
+    ).values_list('pub_date', pk_field)[:limit]
+
+
+class TimelinePaginator(CursorPaginator):
+    """
+    Лента подписок по курсору (pub_date, id).
+
+    Основная часть читается из материализованной ленты читателя, записи
+    популярных авторов добавляются при чтении прямо из posts_post.
+    Обе выборки идут по индексам и сливаются в памяти.
+    """
+
+    def __init__(self, user, per_page, query_params=None):
+        super().__init__(
+            Post.objects.feed(), per_page, query_params=query_params
+        )
+        self.user = user
+
+    @cached_property
+    def celebrity_ids(self):
+        return list(Follow.objects.filter(
+            user=self.user,
+            author__counter__followers_count__gte=(
+                constants.celebrity_follower_threshold
+            ),
+        ).values_list('author_id', flat=True))
+
+    def rows(self, key, pk, descending):
+        limit = self.per_page + 1
+        keys = list(keyset(
+            TimelineEntry.objects.filter(user=self.user), 'post_id',
+            key, pk, descending, limit,
+        ))
+        if self.celebrity_ids:
+            keys += keyset(
+                Post.objects.filter(author_id__in=self.celebrity_ids), 'id',
+                key, pk, descending, limit,
+            )
+        # Запись может попасть в обе выборки, если автор стал популярным
+        # после рассылки.
+        keys = sorted(set(keys), reverse=descending)[:limit]
+        posts = self.object_list.in_bulk([post_id for _, post_id in keys])
+        return [posts[post_id] for _, post_id in keys if post_id in posts]
+
+    def queryset_after(self, key=None, pk=None):
+        return self.rows(key, pk, descending=True)
+
+    def queryset_before(self, key, pk):
+        return self.rows(key, pk, descending=False)
@@ -0,0 +1,77 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.template.base import Template
+
+_local = threading.local()
+
+
+class RequestTimings:
+    """Время, потраченное запросом на SQL, шаблоны и миниатюры."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.active = set()
+
+    def add(self, name, seconds):
+        self.durations[name] += seconds
+        self.counts[name] += 1
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def __call__(self, execute, sql, params, many, context):
+        # Обертка для connection.execute_wrapper().
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add('db', time.perf_counter() - started)
+
+
+def current_timings():
+    return getattr(_local, 'timings', None)
+
+
+@contextmanager
+def collect_timings():
+    previous = current_timings()
+    _local.timings = timings = RequestTimings()
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
+
+
+@contextmanager
+def timed(name):
+    timings = current_timings()
+    # Вложенные замеры одного вида (include внутри шаблона) не
+    # суммируются повторно.
+    if timings is None or name in timings.active:
+        yield
+        return
+    timings.active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.active.discard(name)
+        timings.add(name, time.perf_counter() - started)
+
+
+def install_template_timing():
+    render = Template.render
+    if getattr(render, 'timed', False):
+        return
+
+    def timed_render(self, context):
+        with timed('tpl'):
+            return render(self, context)
+
+    timed_render.timed = True
+    Template.render = timed_render
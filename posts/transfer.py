@@ -0,0 +1,261 @@
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import (ArchivedComment, ArchivedPost, Comment, Group, Post,
+                     User)
+
+MODELS = ('group', 'post', 'comment', 'archived_post', 'archived_comment')
+
+POST_FIELDS = ('id', 'text', 'pub_date', 'author__username', 'group', 'image')
+COMMENT_FIELDS = ('id', 'post', 'author__username', 'text', 'created')
+
+EXPORT_FIELDS = {
+    'group': (Group, ('id', 'title', 'slug', 'description')),
+    'post': (Post, POST_FIELDS),
+    'comment': (Comment, COMMENT_FIELDS),
+    'archived_post': (ArchivedPost, POST_FIELDS),
+    'archived_comment': (ArchivedComment, COMMENT_FIELDS),
+}
+
+
+def last_pk(*models):
+    return max(
+        model.objects.aggregate(last=Max('pk'))['last'] or 0
+        for model in models
+    )
+
+
+@contextmanager
+def explicit_dates(*fields):
+    # bulk_create вызывает pre_save, и auto_now_add перезаписал бы
+    # заранее заданные даты.
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def export_records(name, chunk_size):
+    model, fields = EXPORT_FIELDS[name]
+    keys = [field.replace('__username', '') for field in fields]
+    rows = model.objects.order_by('pk').values_list(*fields)
+    for row in rows.iterator(chunk_size=chunk_size):
+        record = {'model': name}
+        for key, value in zip(keys, row):
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            elif key == 'image':
+                value = value or None
+            record[key] = value
+        yield record
+
+
+def dump_records(names, output, chunk_size, progress=None):
+    meter = RateMeter(progress)
+    for name in names:
+        for record in export_records(name, chunk_size):
+            output.write(json.dumps(record, ensure_ascii=False))
+            output.write('\n')
+            meter.tick(name)
+        meter.finish(name)
+    return meter.total
+
+
+class RateMeter:
+    """Считает строки и раз в every строк сообщает скорость."""
+
+    def __init__(self, progress, every=10000):
+        self.progress = progress
+        self.every = every
+        self.total = 0
+        self.count = 0
+        self.started = time.perf_counter()
+
+    def tick(self, name, rows=1):
+        self.total += rows
+        self.count += rows
+        if self.count >= self.every:
+            self.report(name)
+
+    def finish(self, name):
+        if self.count:
+            self.report(name)
+
+    def report(self, name):
+        self.count = 0
+        if self.progress is not None:
+            elapsed = time.perf_counter() - self.started
+            self.progress(name, self.total, self.total / max(elapsed, 1e-9))
+
+
+class RecordImporter:
+    """
+    Загружает записи JSONL пачками через bulk_create.
+
+    Авторы сопоставляются по username, сообщества — по slug, через
+    словари в памяти. Записи и комментарии получают новые первичные
+    ключи со сдвигом на текущий максимум по горячей и архивной таблицам,
+    поэтому для ссылок комментариев на записи словарь не нужен: каждая
+    пачка комментариев сверяется с базой, и комментарии к отклоненным
+    или отсутствующим в файле записям передаются в reject(line, error)
+    вместо вставки. Архивные записи и комментарии загружаются обратно в
+    архивные таблицы.
+    """
+
+    def __init__(self, batch_size, progress=None, reject=None):
+        self.batch_size = batch_size
+        self.meter = RateMeter(progress)
+        self.reject = reject
+        self.batches = {name: [] for name in MODELS}
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = {}
+        self.group_slugs = dict(Group.objects.values_list('slug', 'pk'))
+        # Архив хранит прежние id, поэтому горячая и архивная таблицы
+        # делят одно пространство ключей и сдвиг у них общий.
+        self.post_offset = last_pk(Post, ArchivedPost)
+        self.comment_offset = last_pk(Comment, ArchivedComment)
+        self.password = make_password(None)
+
+    def add(self, record, line=None):
+        name = record.get('model')
+        if name not in MODELS:
+            raise ValidationError(f'Неизвестная модель: {name!r}')
+        if name != 'group' and not isinstance(record.get('author'), str):
+            raise ValidationError('Не указан автор')
+        obj = getattr(self, f'build_{name}')(record)
+        obj.full_clean(
+            exclude=('author', 'group', 'post'), validate_unique=False
+        )
+        self.batches[name].append((obj, record, line))
+        if len(self.batches[name]) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        # Пачки сбрасываются вместе и по порядку, чтобы ссылки на
+        # сообщества и записи уже были в базе.
+        for name in MODELS:
+            batch = self.batches[name]
+            if batch:
+                with transaction.atomic():
+                    saved = getattr(self, f'save_{name}')(batch)
+                self.meter.tick(name, saved)
+                self.batches[name] = []
+
+    def finish(self):
+        self.flush()
+        self.meter.finish('всего')
+        return self.meter.total
+
+    def date(self, value):
+        moment = parse_datetime(value or '')
+        if moment is None:
+            raise ValidationError(f'Некорректная дата: {value!r}')
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment
+
+    def build_group(self, record):
+        return Group(
+            title=record['title'], slug=record['slug'],
+            description=record['description'],
+        )
+
+    def build_post(self, record, model=Post):
+        return model(
+            pk=int(record['id']) + self.post_offset,
+            text=record['text'],
+            pub_date=self.date(record['pub_date']),
+            image=record.get('image') or None,
+        )
+
+    def build_comment(self, record, model=Comment):
+        return model(
+            pk=int(record['id']) + self.comment_offset,
+            post_id=int(record['post']) + self.post_offset,
+            text=record['text'],
+            created=self.date(record['created']),
+        )
+
+    def build_archived_post(self, record):
+        return self.build_post(record, ArchivedPost)
+
+    def build_archived_comment(self, record):
+        return self.build_comment(record, ArchivedComment)
+
+    def resolve_authors(self, batch):
+        authors = {record['author'] for _, record, _ in batch}
+        missing = authors - set(self.users)
+        if missing:
+            User.objects.bulk_create(
+                [User(username=username, password=self.password)
+                 for username in missing],
+                ignore_conflicts=True,
+            )
+            self.users.update(User.objects.filter(
+                username__in=missing
+            ).values_list('username', 'pk'))
+        for obj, record, _ in batch:
+            obj.author_id = self.users[record['author']]
+
+    def save_group(self, batch):
+        new = [obj for obj, _, _ in batch if obj.slug not in self.group_slugs]
+        Group.objects.bulk_create(new, ignore_conflicts=True)
+        self.group_slugs.update(Group.objects.filter(
+            slug__in=[obj.slug for obj in new]
+        ).values_list('slug', 'pk'))
+        for obj, record, _ in batch:
+            self.groups[record['id']] = self.group_slugs[obj.slug]
+        return len(batch)
+
+    def save_post(self, batch, model=Post):
+        self.resolve_authors(batch)
+        for obj, record, _ in batch:
+            obj.group_id = self.groups.get(record.get('group'))
+        with explicit_dates(Post._meta.get_field('pub_date')):
+            model.objects.bulk_create([obj for obj, _, _ in batch])
+        return len(batch)
+
+    def save_comment(self, batch, model=Comment, post_model=Post):
+        loaded = set(post_model.objects.filter(
+            pk__in={obj.post_id for obj, _, _ in batch}
+        ).values_list('pk', flat=True))
+        kept = []
+        for obj, record, line in batch:
+            if obj.post_id in loaded:
+                kept.append((obj, record, line))
+            elif self.reject is not None:
+                self.reject(line, ValidationError(
+                    f'Запись {record["post"]!r} не загружена из этого файла'
+                ))
+        self.resolve_authors(kept)
+        with explicit_dates(Comment._meta.get_field('created')):
+            model.objects.bulk_create([obj for obj, _, _ in kept])
+        return len(kept)
+
+    def save_archived_post(self, batch):
+        return self.save_post(batch, ArchivedPost)
+
+    def save_archived_comment(self, batch):
+        saved = self.save_comment(batch, ArchivedComment, ArchivedPost)
+        # reconcile_counters не пересчитывает архив, поэтому счетчики
+        # комментариев архивных записей обновляются здесь.
+        counts = Counter(ArchivedComment.objects.filter(
+            pk__in=[obj.pk for obj, _, _ in batch]
+        ).values_list('post_id', flat=True))
+        for post_id, count in counts.items():
+            ArchivedPost.objects.filter(pk=post_id).update(
+                comment_count=F('comment_count') + count
+            )
+        return saved
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.files.uploadhandler import (SkipFile,
+                                             TemporaryFileUploadHandler)
+from django.template.defaultfilters import filesizeformat
+
+
+def upload_too_large_message():
+    return (
+        'Файл слишком большой, максимальный размер — '
+        f'{filesizeformat(settings.IMAGE_UPLOAD_MAX_SIZE)}'
+    )
+
+
+class CappedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Пишет загрузку сразу во временный файл на диске и обрывает ее, как
+    только превышен IMAGE_UPLOAD_MAX_SIZE: большой файл не оседает ни в
+    памяти, ни на диске. Имена отброшенных полей сохраняются в
+    request.rejected_uploads, чтобы форма показала ошибку.
+    """
+
+    def new_file(self, field_name, *args, **kwargs):
+        self.received = 0
+        super().new_file(field_name, *args, **kwargs)
+        # Размер части, если клиент его прислал, позволяет отказать
+        # еще до чтения данных.
+        if (self.content_length or 0) > settings.IMAGE_UPLOAD_MAX_SIZE:
+            self.reject()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.IMAGE_UPLOAD_MAX_SIZE:
+            self.reject()
+        return super().receive_data_chunk(raw_data, start)
+
+    def reject(self):
+        if not hasattr(self.request, 'rejected_uploads'):
+            self.request.rejected_uploads = set()
+        self.request.rejected_uploads.add(self.field_name)
+        # MultiPartParser закроет файл, и временный файл удалится.
+        raise SkipFile
@@ -5,10 +5,23 @@ from . import views
 urlpatterns = [
     path('404/', views.page_not_found, name='404'),
     path('500/', views.server_error, name='500'),
+    path('metrics', views.metrics, name='metrics'),
     path('group/<slug:slug>/', views.group_posts, name='group_posts'),
     path('new/', views.new_post, name='new_post'),
+    path('search/', views.search, name='search'),
+    path('follow/', views.follow_index, name='follow_index'),
     path('', views.index, name='index'),
     path('<str:username>/', views.profile, name='profile'),
+    path(
+        '<str:username>/follow/',
+        views.profile_follow,
+        name='profile_follow'
+        ),
+    path(
+        '<str:username>/unfollow/',
+        views.profile_unfollow,
+        name='profile_unfollow'
+        ),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
     path(
         '<str:username>/<int:post_id>/edit/',
@@ -20,4 +33,9 @@ urlpatterns = [
         views.add_comment,
         name='add_comment'
         ),
+    path(
+        '<username>/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+        ),
 ]
@@ -1,18 +1,44 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import require_POST
 
 from posts import constants
+from posts.cache import conditional_page, feed_count_key
 
 from .forms import CommentForm, PostForm
-from .models import Group, Post, User
+from .metrics import render_metrics
+from .models import ArchivedPost, Follow, Group, Post, User
+from .paginators import CursorPaginator, get_feed_page
+from .search import SearchPaginator
+from .timelines import TimelinePaginator, follow, unfollow
+
+
+def find_post(post_id, **filters):
+    """Запись из горячей таблицы, а если ее там уже нет — из архива."""
+    for model in (Post, ArchivedPost):
+        post = model.objects.feed().select_related(
+            'author__counter'
+        ).filter(pk=post_id, **filters).first()
+        if post is not None:
+            return post
+    raise Http404
+
+
+def is_following(user, author):
+    return (
+        user.is_authenticated and user != author
+        and Follow.objects.filter(user=user, author=author).exists()
+    )
 
 
+@conditional_page('index')
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, constants.posts_per_page)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = Post.objects.feed()
+    paginator, page = get_feed_page(
+        request, post_list, constants.posts_per_page,
+        count_key=feed_count_key('index'),
+    )
     return render(
         request,
         'index.html',
@@ -20,12 +46,20 @@ def index(request):
     )
 
 
+@conditional_page('group_posts')
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, constants.posts_per_page)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    group = get_object_or_404(
+        Group.objects.select_related('counter'), slug=slug
+    )
+    posts = group.posts.feed()
+    counter = getattr(group, 'counter', None)
+    archived = counter.archived_posts_count if counter else 0
+    paginator, page = get_feed_page(
+        request, posts, constants.posts_per_page,
+        count=counter.posts_count - archived if counter else 0,
+        archive=ArchivedPost.objects.feed().filter(group=group),
+        archived=archived,
+    )
     return render(
         request,
         'posts/group.html',
@@ -33,9 +67,58 @@ def group_posts(request, slug):
     )
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = SearchPaginator(query, constants.posts_per_page)
+    page = paginator.get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    return render(
+        request,
+        'posts/search.html',
+        {'page': page, 'paginator': paginator, 'query': query}
+    )
+
+
+@login_required
+def follow_index(request):
+    paginator = TimelinePaginator(request.user, constants.posts_per_page)
+    page = paginator.get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    return render(
+        request,
+        'posts/follow.html',
+        {'page': page, 'paginator': paginator}
+    )
+
+
+@login_required
+@require_POST
+def profile_follow(request, username):
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        follow(request.user, author)
+    return redirect('profile', username=username)
+
+
+@login_required
+@require_POST
+def profile_unfollow(request, username):
+    author = get_object_or_404(User, username=username)
+    unfollow(request.user, author)
+    return redirect('profile', username=username)
+
+
 @login_required
 def new_post(request):
-    form = PostForm(request.POST or None)
+    form = PostForm(
+        request.POST or None,
+        files=request.FILES or None,
+        rejected_uploads=getattr(request, 'rejected_uploads', ()),
+    )
     if form.is_valid():
         form.instance.author = request.user
         form.save()
@@ -43,26 +126,37 @@ def new_post(request):
     return render(request, 'posts/newpost.html', {'form': form})
 
 
+@conditional_page('profile')
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    paginator = Paginator(posts, constants.posts_per_page)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    author = get_object_or_404(
+        User.objects.select_related('counter'), username=username
+    )
+    posts = author.posts.feed()
+    counter = getattr(author, 'counter', None)
+    archived = counter.archived_posts_count if counter else 0
+    paginator, page = get_feed_page(
+        request, posts, constants.posts_per_page,
+        count=counter.posts_count - archived if counter else 0,
+        archive=ArchivedPost.objects.feed().filter(author=author),
+        archived=archived,
+    )
     return render(
         request,
         'posts/profile.html',
         {'page': page,
          'paginator': paginator,
-         'author': author}
+         'author': author,
+         'following': is_following(request.user, author)}
     )
 
 
+@conditional_page('post')
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, author__username=username, pk=post_id)
+    post = find_post(post_id, author__username=username)
     return render(
         request, 'posts/post.html',
-        {'post': post, 'author': post.author}
+        {'post': post, 'author': post.author,
+         'following': is_following(request.user, post.author)}
     )
 
 
@@ -76,7 +170,8 @@ def post_edit(request, username, post_id):
     form = PostForm(
         request.POST or None,
         files=request.FILES or None,
-        instance=post
+        instance=post,
+        rejected_uploads=getattr(request, 'rejected_uploads', ()),
     )
 
     if form.is_valid():
@@ -88,6 +183,13 @@ def post_edit(request, username, post_id):
     )
 
 
+def metrics(request):
+    """Метрики всех процессов в текстовом формате Prometheus."""
+    return HttpResponse(
+        render_metrics(), content_type='text/plain; version=0.0.4'
+    )
+
+
 def page_not_found(request, exception):
     return render(
         request,
@@ -101,12 +203,20 @@ def server_error(request):
     return render(request, "misc/500.html", status=500)
 
 
+def get_comment_page(request, post):
+    paginator = CursorPaginator(
+        post.comments.select_related('author'),
+        constants.comments_per_page, key='created',
+    )
+    return paginator.get_page(after=request.GET.get('after'))
+
+
 @login_required
 def add_comment(request, username, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    form = CommentForm(request.POST or None)
-    comments = post.comments.all()
-    if form.is_valid():
+    post = find_post(post_id)
+    # Архивные записи доступны только для чтения.
+    form = None if post.archived else CommentForm(request.POST or None)
+    if form is not None and form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
@@ -115,5 +225,16 @@ def add_comment(request, username, post_id):
     return render(
         request,
         'posts/include/comment.html',
-        {'form': form, 'comments': comments}
+        {'form': form, 'page': get_comment_page(request, post),
+         'post': post}
+    )
+
+
+def post_comments(request, username, post_id):
+    """Следующая страница комментариев HTML-фрагментом для подгрузки."""
+    post = find_post(post_id, author__username=username)
+    return render(
+        request,
+        'posts/include/comment_list.html',
+        {'page': get_comment_page(request, post), 'post': post}
     )
@@ -5,7 +5,7 @@ from django.core.paginator import Page, Paginator
 
 def get_field_context(context, field_type):
     for field in context.keys():
-        if field not in ('user', 'request') and type(context[field]) == field_type:
+        if field not in ('user', 'request') and isinstance(context[field], field_type):
             return context[field]
     return
 
@@ -0,0 +1,238 @@
+"SQLite cache backend shared by all worker processes on a host."
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class SQLiteCache(BaseCache):
+    """
+    Кеш в файле SQLite в режиме WAL.
+
+    В отличие от LocMemCache, данные видны всем процессам gunicorn на
+    одном сервере, поэтому инвалидация из любого воркера доходит до всех.
+    Целые числа хранятся как INTEGER, и incr/decr выполняются одним
+    UPDATE внутри BEGIN IMMEDIATE, то есть атомарно между процессами.
+    Вытеснение — по TTL и по давности последнего чтения (приближенный
+    LRU: время чтения обновляется не чаще раза в TOUCH_INTERVAL секунд).
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._touch_interval = int(options.get('TOUCH_INTERVAL', 60))
+        self._cull_interval = int(options.get('CULL_INTERVAL', 100))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+
+    @property
+    def _connection(self):
+        # Соединение нельзя наследовать через fork, поэтому оно
+        # заводится заново в каждом процессе и потоке.
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = self._connect()
+            local.pid = os.getpid()
+            local.sets = 0
+        return local.connection
+
+    def _connect(self):
+        connection = sqlite3.connect(
+            self._path, timeout=self._busy_timeout, isolation_level=None
+        )
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.executescript('''
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires REAL,
+                accessed REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires);
+            CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+        ''')
+        return connection
+
+    def _write(self, statements):
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            result = statements(connection)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return result
+
+    def _encode(self, value):
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _decode(self, value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        if not keys:
+            return {}
+        keys_map = {self._key(key, version): key for key in keys}
+        now = time.time()
+        placeholders = ', '.join('?' * len(keys_map))
+        rows = self._connection.execute(
+            f'SELECT key, value, accessed FROM cache '
+            f'WHERE key IN ({placeholders}) '
+            f'AND (expires IS NULL OR expires > ?)',
+            [*keys_map, now],
+        ).fetchall()
+        stale = [key for key, _, accessed in rows
+                 if now - accessed > self._touch_interval]
+        if stale:
+            self._write(lambda connection: connection.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?',
+                [(now, key) for key in stale],
+            ))
+        return {keys_map[key]: self._decode(value) for key, value, _ in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        rows = [
+            (self._key(key, version), self._encode(value), expires, now)
+            for key, value in data.items()
+        ]
+        self._write(lambda connection: connection.executemany(
+            'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+            'VALUES (?, ?, ?, ?)',
+            rows,
+        ))
+        self._maybe_cull(len(rows))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+
+        def add(connection):
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?', (key, now)
+            )
+            return connection.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)',
+                (key, self._encode(value), expires, now),
+            ).rowcount == 1
+
+        added = self._write(add)
+        if added:
+            self._maybe_cull(1)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        return self._write(lambda connection: connection.execute(
+            'UPDATE cache SET expires = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()),
+        ).rowcount == 1)
+
+    def incr(self, key, delta=1, version=None):
+        cache_key = self._key(key, version)
+
+        def incr(connection):
+            updated = connection.execute(
+                "UPDATE cache SET value = value + ? WHERE key = ? "
+                "AND typeof(value) = 'integer' "
+                "AND (expires IS NULL OR expires > ?)",
+                (delta, cache_key, time.time()),
+            ).rowcount
+            if updated:
+                return connection.execute(
+                    'SELECT value FROM cache WHERE key = ?', (cache_key,)
+                ).fetchone()[0]
+            return None
+
+        value = self._write(incr)
+        if value is None:
+            # Отсутствующий ключ или нецелое значение: поведение как
+            # у встроенных бэкендов.
+            value = self.get(key, version=version)
+            if value is None:
+                raise ValueError("Key '%s' not found" % key)
+            value += delta
+            self.set(key, value, version=version)
+        return value
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._connection.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if not keys:
+            return
+        placeholders = ', '.join('?' * len(keys))
+        self._write(lambda connection: connection.execute(
+            f'DELETE FROM cache WHERE key IN ({placeholders})', keys
+        ))
+
+    def clear(self):
+        self._write(lambda connection: connection.execute(
+            'DELETE FROM cache'
+        ))
+
+    def _maybe_cull(self, added):
+        local = self._local
+        local.sets += added
+        if local.sets < self._cull_interval:
+            return
+        local.sets = 0
+        self._write(self._cull)
+
+    def _cull(self, connection):
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+        )
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE key IN ('
+            'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            (count - self._max_entries + count // self._cull_frequency,),
+        )
+
+    def close(self, **kwargs):
+        # Соединение живет дольше запроса: открывать его заново на каждый
+        # запрос дороже, чем держать.
+        pass
@@ -0,0 +1,125 @@
+"Read-replica routing with read-your-writes stickiness."
+import random
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+from posts.cache import changed_recently
+
+READ_VIEWS = ('index', 'group_posts', 'profile', 'post', 'post_comments')
+SAFE_METHODS = ('GET', 'HEAD')
+STICKY_COOKIE = 'use_primary'
+# Сессии читаются на каждом запросе и только что созданная сессия
+# может еще не дойти до реплики.
+PRIMARY_APPS = ('sessions',)
+
+_state = threading.local()
+
+
+def separate_replicas():
+    # В тестах реплики зеркалируют default (TEST MIRROR), и тогда
+    # чтение с них ничем не отличается от чтения с основной базы.
+    primary = connections['default'].settings_dict['NAME']
+    return [
+        alias for alias in settings.DATABASE_REPLICAS
+        if connections[alias].settings_dict['NAME'] != primary
+    ]
+
+
+@contextmanager
+def use_replicas():
+    previous = getattr(_state, 'replicas', False)
+    _state.replicas = True
+    try:
+        yield
+    finally:
+        _state.replicas = previous
+
+
+class ReplicaRouter:
+    """
+    Чтение — с реплик, но только внутри use_replicas(); все остальное,
+    включая любые записи и миграции, идет в default.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            getattr(_state, 'replicas', False)
+            and model._meta.app_label not in PRIMARY_APPS
+        ):
+            replicas = separate_replicas()
+            if replicas:
+                return random.choice(replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат копию тех же таблиц.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Отправляет GET-запросы лент и страницы записи на реплики.
+
+    После POST клиент получает cookie, и пока она жива, его запросы
+    читают с основной базы: так автор сразу видит свою запись или
+    комментарий, даже если реплика еще не догнала основную базу.
+
+    Страница, версия которой менялась не раньше REPLICA_MAX_LAG_SECONDS
+    назад, тоже читается с основной базы для всех. Иначе HTML с
+    отстающей реплики попал бы в кеш страниц и в 304-ответы под новой
+    версией и оставался бы там до следующей записи.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if self.can_use_replica(request):
+            with use_replicas():
+                response = self.get_response(request)
+        else:
+            response = self.get_response(request)
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(
+                STICKY_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS, httponly=True,
+            )
+        return response
+
+    def can_use_replica(self, request):
+        if request.method not in SAFE_METHODS:
+            return False
+        if STICKY_COOKIE in request.COOKIES:
+            return False
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        return match.url_name in READ_VIEWS and not changed_recently(
+            match.url_name, match.kwargs, settings.REPLICA_MAX_LAG_SECONDS
+        )
+
+
+def copy_database(source, target):
+    """
+    Заменитель репликации для локальной работы: целиком копирует файл
+    SQLite через backup API, согласованно даже при параллельной записи.
+    """
+    primary = sqlite3.connect(source)
+    replica = sqlite3.connect(target)
+    try:
+        primary.backup(replica)
+    finally:
+        replica.close()
+        primary.close()
@@ -1,4 +1,8 @@
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -28,6 +32,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'posts.middleware.ServerTimingMiddleware',
+    'posts.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -35,6 +41,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'yatube.db_router.ReplicaRoutingMiddleware',
+    'posts.middleware.AnonymousPageCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -64,6 +72,29 @@ DATABASES = {
     }
 }
 
+# Файлы реплик через запятую, например
+# DATABASE_REPLICA_FILES=replica1.sqlite3,replica2.sqlite3.
+# Локально их наполняет команда replicate_databases.
+DATABASE_REPLICAS = []
+for number, name in enumerate(filter(None, os.environ.get(
+    'DATABASE_REPLICA_FILES', ''
+).split(',')), 1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, name),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['yatube.db_router.ReplicaRouter']
+
+# Верхняя граница отставания реплик. Страницы, менявшиеся за это время,
+# и запросы недавно писавших клиентов читают с основной базы.
+REPLICA_MAX_LAG_SECONDS = 10
+
+REPLICA_STICKY_SECONDS = REPLICA_MAX_LAG_SECONDS
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.'
@@ -99,6 +130,48 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузки сразу пишутся во временные файлы на диске, а не в память.
+FILE_UPLOAD_HANDLERS = ['posts.uploads.CappedTemporaryFileUploadHandler']
+
+IMAGE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+
+THUMBNAIL_WORKERS = 2
+
+JOB_WORKERS = 2
+
+# Записи старше этого числа дней команда archive_posts переносит в
+# архивные таблицы.
+POST_ARCHIVE_AFTER_DAYS = int(os.environ.get('POST_ARCHIVE_AFTER_DAYS', 90))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'posts.timing': {
+            'handlers': ['console'],
+            'level': os.environ.get(
+                'TIMING_LOG_LEVEL', 'WARNING' if DEBUG else 'INFO'
+            ),
+            'propagate': False,
+        },
+        'posts.deletion': {
+            'handlers': ['console'],
+            'level': 'WARNING' if DEBUG else 'INFO',
+            'propagate': False,
+        },
+        'posts.archive': {
+            'handlers': ['console'],
+            'level': 'WARNING' if DEBUG else 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 LOGIN_URL = '/auth/login/'
 LOGIN_REDIRECT_URL = 'index'
 
@@ -107,8 +180,24 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 SITE_ID = 1
 
+# Кеш и метрики — файлы, общие для всех процессов сервера. Тесты
+# получают свой временный каталог, который через окружение наследуют
+# и их дочерние процессы, и не трогают данные работающего сайта.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+if TESTING and 'YATUBE_STATE_DIR' not in os.environ:
+    os.environ['YATUBE_STATE_DIR'] = tempfile.mkdtemp(prefix='yatube-test-')
+    atexit.register(shutil.rmtree, os.environ['YATUBE_STATE_DIR'], True)
+STATE_DIR = os.environ.get('YATUBE_STATE_DIR', BASE_DIR)
+
+# Общее для всех процессов хранилище метрик для /metrics.
+METRICS_PATH = os.path.join(STATE_DIR, 'metrics.sqlite3')
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'yatube.cache.SQLiteCache',
+        'LOCATION': os.path.join(STATE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
     }
 }